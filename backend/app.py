@@ -1,106 +1,391 @@
-
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, request, jsonify, Response, g
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from passlib.hash import pbkdf2_sha256
 import sqlite3
+import base64
+import db
+import itertools
+import json
+import logging
+import tempfile
+import threading
+import time
 import numpy as np
-import pandas as pd
-import joblib
 import os
+import atexit
 from nutrition_recommendation import DiabetesNutritionAdvisor
+from model_registry import SAMPLE_INPUT, ModelRegistry
+from batching import PredictionBatcher
+from prediction_cache import PredictionCache
+from password_hashing import PasswordHasher, PasswordHasherBusy
+from bulk_scoring import CSV_REQUIRED_COLUMNS, ScoringJobs, ScoringJobsBusy, label_csv_predictions
+from features import FEATURE_COLUMNS
+import hmac
+import instrumentation
+from instrumentation import DB_LATENCY, INFERENCE_LATENCY, REQUEST_LATENCY, REQUEST_LOGGER
 
-app = Flask(__name__)
-CORS(app)
-app.config['JWT_SECRET_KEY'] = 'your-secret-key-here'  # Change this in production!
-jwt = JWTManager(app)
+# pandas, joblib and scikit-learn are imported lazily (CSV endpoints and model
+# loading) so importing this module and spawning workers stays fast.
 
-# Define the absolute path to users.db
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, 'users.db')
+api = Blueprint('api', __name__)
+
+log = logging.getLogger('diabetes_app.app')
+# Per-request lines; LOG_SAMPLE_RATE thins these out under load
+request_log = logging.getLogger(REQUEST_LOGGER)
+
+# Versioned models live under MODEL_REGISTRY_DIR; without any, the legacy
+# rmodel.pkl / model_accuracy.txt next to this file are served.
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(db.BASE_DIR, 'models'))
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(db.BASE_DIR, 'rmodel.pkl'))
+MODEL_ACCURACY_PATH = os.environ.get('MODEL_ACCURACY_PATH', os.path.join(db.BASE_DIR, 'model_accuracy.txt'))
+MODEL_ADMIN_TOKEN = os.environ.get('MODEL_ADMIN_TOKEN')
+JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(db.BASE_DIR, 'jobs'))
+
+# Process-wide services, set up by create_app()
+model_registry = None
+model_load_error = None
+batcher = None
+prediction_cache = None
+password_hasher = None
+scoring_jobs = None
+_fork_hook_registered = False
+
+
+def load_model():
+    """Load and warm up the active model version, then start following ACTIVE-file changes."""
+    global model_load_error
+    try:
+        active_model = model_registry.load_active()
+    except Exception as e:
+        model_load_error = str(e)
+        log.exception("Error loading model")
+        return
+    if active_model is None:
+        model_load_error = "Model file not found"
+        log.error("Model file not found. Please train and save the model first.")
+    else:
+        prediction = active_model.predictor.predict(SAMPLE_INPUT)
+        log.info("Model loaded", extra={
+            'model_version': active_model.version,
+            'path': active_model.path,
+            'sample_prediction': "Diabetic" if prediction[0] == 1 else "Non-Diabetic",
+        })
+    # Follow ACTIVE-file changes made by other workers or the training pipeline
+    model_registry.start_watcher(float(os.environ.get('MODEL_WATCH_INTERVAL', 5)))
+
+
+def start_model_loader():
+    threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+
+
+def _load_model_after_fork():
+    # A worker forked before the master's loader finished (e.g. ``gunicorn
+    # --preload`` without MODEL_PRELOAD) inherits neither the model nor the
+    # loader thread, so it loads its own
+    if model_registry is not None and model_registry.active is None:
+        start_model_loader()
+
+
+def start_background_services():
+    scoring_jobs.start()
+
+
+def create_app(preload_model=None):
+    """Build the Flask app and its process-wide services.
+
+    By default the model loads and warms up in a background thread, so the
+    worker accepts traffic immediately and /ready answers 503 until scoring
+    is possible. ``preload_model=True`` (or MODEL_PRELOAD=1) loads it before
+    returning instead, e.g. in a ``gunicorn --preload`` master so forked
+    workers share the loaded pages. Workers forked while nothing is loaded
+    start their own loader, and the CSV job runner only starts on a
+    process's first request, so a preload master never claims jobs.
+    """
+    global model_registry, batcher, prediction_cache, password_hasher, scoring_jobs, _fork_hook_registered
+
+    instrumentation.configure_logging()
+
+    app = Flask(__name__)
+    CORS(app)
+    app.config['JWT_SECRET_KEY'] = 'your-secret-key-here'  # Change this in production!
+    JWTManager(app)
+    app.register_blueprint(api)
+    app.before_request(start_request_timer)
+    app.before_request(start_background_services)
+    app.after_request(record_request)
+    instrumentation.REGISTRY.add_collector(collect_service_metrics)
+
+    db.init_db()
+
+    model_registry = ModelRegistry(MODEL_REGISTRY_DIR, MODEL_PATH, MODEL_ACCURACY_PATH)
+    atexit.register(model_registry.stop_watcher)
+
+    # Opt-in coalescing of concurrent /predict calls into batched predict_proba calls
+    batcher = None
+    if os.environ.get('PREDICT_BATCHING', '').lower() in ('1', 'true', 'yes'):
+        batcher = PredictionBatcher(
+            lambda active, rows: active.predictor.predict_proba(rows),
+            max_wait_ms=float(os.environ.get('PREDICT_BATCH_MAX_WAIT_MS', 2.0)),
+            max_batch=int(os.environ.get('PREDICT_BATCH_MAX_SIZE', 32)),
+        )
+        atexit.register(batcher.close)
+
+    # Repeated inputs (re-submitted forms, kiosk defaults) skip the model entirely.
+    # PREDICTION_CACHE_SIZE=0 turns the cache off.
+    prediction_cache = None
+    if int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)) > 0:
+        prediction_cache = PredictionCache(
+            max_entries=int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)),
+            ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', 300)),
+        )
+
+    # PBKDF2 runs in a small process pool so logins cannot starve /predict.
+    # PASSWORD_HASH_WORKERS=0 hashes inline on the request thread.
+    password_hasher = PasswordHasher(
+        workers=int(os.environ.get('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1))),
+        max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE', 16)),
+        rounds=int(os.environ['PASSWORD_HASH_ROUNDS']) if os.environ.get('PASSWORD_HASH_ROUNDS') else None,
+    )
+    atexit.register(password_hasher.close)
+
+    # Background CSV scoring. Its pool defaults to half the cores, runs at a
+    # lower priority and only JOBS_MAX_RUNNING jobs run at once, so large
+    # uploads cannot crowd out interactive /predict calls.
+    scoring_jobs = ScoringJobs(
+        JOBS_DIR, model_registry,
+        workers=int(os.environ.get('JOBS_WORKERS', max(1, (os.cpu_count() or 1) // 2))),
+        max_queued=int(os.environ.get('JOBS_MAX_QUEUED', 20)),
+        max_running=int(os.environ.get('JOBS_MAX_RUNNING', 1)),
+        shard_bytes=int(os.environ.get('JOBS_SHARD_MB', 16)) * 1024 * 1024,
+        niceness=int(os.environ.get('JOBS_NICE', 10)),
+        chunk_size=CSV_CHUNK_SIZE,
+        retention_seconds=float(os.environ.get('JOBS_RETENTION_HOURS', 24)) * 3600 or None,
+    )
+    atexit.register(scoring_jobs.close)
+
+    if preload_model is None:
+        preload_model = os.environ.get('MODEL_PRELOAD', '').lower() in ('1', 'true', 'yes')
+    if preload_model:
+        load_model()
+    else:
+        start_model_loader()
+    if not _fork_hook_registered:
+        os.register_at_fork(after_in_child=_load_model_after_fork)
+        _fork_hook_registered = True
+    return app
 
-def init_db():
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS users 
-                     (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT)''')
-        c.execute('''CREATE TABLE IF NOT EXISTS predictions 
-                     (id INTEGER PRIMARY KEY, user_id INTEGER, prediction TEXT, 
-                      glucose REAL, blood_pressure REAL, risk_percentage REAL, 
-                      diet_suggestion TEXT, sex TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                      FOREIGN KEY(user_id) REFERENCES users(id))''')
-        conn.commit()
-
-init_db()
-
-MODEL_PATH = 'rmodel.pkl'
-
-if not os.path.exists(MODEL_PATH):
-    print("Model file not found. Please train and save the model first.")
-    model = None
-else:
-    model = joblib.load(MODEL_PATH)
-    print(f"Model loaded from {MODEL_PATH}")
-
-if model:
-    sample_input = np.array([[2, 120, 70, 20, 85, 32.5, 0.5, 25]])
-    prediction = model.predict(sample_input)
-    result = "Diabetic" if prediction[0] == 1 else "Non-Diabetic"
-    print(f"Sample prediction: {prediction[0]} => {result}")
-
-try:
-    with open("model_accuracy.txt", "r") as f:
-        model_accuracy = float(f.read()) * 100
-except FileNotFoundError:
-    model_accuracy = None
+
+CSV_CHUNK_SIZE = int(os.environ.get('PREDICT_CSV_CHUNK_SIZE', 10000))
+# Longest /history waits for the write-behind queue before reading
+HISTORY_FLUSH_TIMEOUT = float(os.environ.get('HISTORY_FLUSH_TIMEOUT', 2.0))
+
+
+def predict_proba_cached(active, X):
+    """predict_proba for a DataFrame of feature rows, serving repeated rows from the cache."""
+    if prediction_cache is None:
+        with INFERENCE_LATENCY.time(path='predict_csv'):
+            return active.predictor.predict_proba(X)
+    rows = X.to_numpy(dtype=np.float64)
+    probs = prediction_cache.get_many(active.version, rows)
+    missing = [i for i, prob in enumerate(probs) if prob is None]
+    if missing:
+        with INFERENCE_LATENCY.time(path='predict_csv'):
+            scored = active.predictor.predict_proba(X.iloc[missing]).tolist()
+        prediction_cache.put_many(active.version, rows[missing], scored)
+        for i, prob in zip(missing, scored):
+            probs[i] = prob
+    return np.array(probs)
+
+
+def iter_csv_predictions(active, chunks):
+    """Score CSV chunks one at a time, yielding one result dict per row."""
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        probs = predict_proba_cached(active, chunk[FEATURE_COLUMNS])
+        labels = label_csv_predictions(active, probs)
+        for name, label, risk in zip(chunk['Name'].tolist(), labels.tolist(), (probs[:, 1] * 100).tolist()):
+            yield {
+                'name': name,
+                'prediction': label,
+                'risk_percentage': risk
+            }
+
+
+def stream_csv_predictions(results, fmt, upload):
+    """Serialize prediction results as NDJSON lines or as one chunked JSON document."""
+    try:
+        if fmt == 'ndjson':
+            for row in results:
+                yield json.dumps(row) + '\n'
+        else:
+            yield '{"predictions": ['
+            for i, row in enumerate(results):
+                yield (',' if i else '') + json.dumps(row)
+            yield ']}'
+    except Exception as e:
+        # Headers are already sent, so report the failure in-band
+        if fmt == 'ndjson':
+            yield json.dumps({'error': str(e)}) + '\n'
+        else:
+            yield '], "error": ' + json.dumps(str(e)) + '}'
+    finally:
+        upload.close()
 
 
 # CSV prediction endpoint for doctors
-@app.route('/predict_csv', methods=['POST'])
+# Pass ?stream=ndjson (one JSON object per line) or ?stream=json (chunked
+# {"predictions": [...]}) to score large files with bounded memory.
+@api.route('/predict_csv', methods=['POST'])
 def predict_csv():
     file = request.files.get('file')
     if not file:
         return jsonify({'error': 'No file uploaded'}), 400
+    active = model_registry.active
+    if active is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+
+    stream = request.args.get('stream')
+    if stream not in (None, 'ndjson', 'json'):
+        return jsonify({'error': "stream must be 'ndjson' or 'json'"}), 400
 
     try:
-        df = pd.read_csv(file)
-        required_cols = [
-            'Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
-            'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age', 'Name'
-        ]
+        chunk_size = int(request.args.get('chunk_size', CSV_CHUNK_SIZE))
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The temporary copy made for streaming; closed here unless the response takes it over
+    upload = None
+    try:
+        import pandas as pd
 
-        if not all(col in df.columns for col in required_cols):
+        if stream:
+            # Flask closes uploaded files when the view returns, so a
+            # streamed response reads from its own on-disk copy instead
+            upload = tempfile.TemporaryFile()
+            file.save(upload)
+            upload.seek(0)
+        reader = pd.read_csv(upload if upload is not None else file.stream, chunksize=chunk_size)
+        first = next(reader, None)
+        if first is None or not all(col in first.columns for col in CSV_REQUIRED_COLUMNS):
+            if upload is not None:
+                upload.close()
             return jsonify({'error': 'Missing required columns'}), 400
 
-        names = df['Name'].tolist()
-        X = df.drop(columns=['Name'])
-        preds = model.predict(X)
-        probs = model.predict_proba(X)
-
-        result = []
-        for name, pred, prob in zip(names, preds, probs):
-            label = (
-                "Diabetic" if pred == 1 else
-                "Borderline Risk" if prob[1] > 0.35 else
-                "Non-Diabetic"
-            )
-            result.append({
-                'name': name,
-                'prediction': label,
-                'risk_percentage': prob[1] * 100
-            })
+        # The whole file is scored by the model that was active when it arrived
+        results = iter_csv_predictions(active, itertools.chain([first], reader))
+
+        if stream:
+            mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+            return Response(stream_csv_predictions(results, stream, upload), mimetype=mimetype)
 
-        return jsonify({'predictions': result})
+        return jsonify({'predictions': list(results)})
 
     except Exception as e:
+        if upload is not None:
+            upload.close()
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/')
+# Asynchronous CSV scoring for uploads too large to hold a request open.
+# POST returns a job id at once; poll the status URL, then fetch the result.
+@api.route('/predict_csv/jobs', methods=['POST'])
+def submit_scoring_job():
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file uploaded'}), 400
+    active = model_registry.active
+    if active is None:
+        return jsonify({'error': 'Model not loaded'}), 503
+
+    try:
+        job_id = scoring_jobs.submit(file, file.filename, active.version)
+    except ScoringJobsBusy as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception("Error submitting scoring job")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/predict_csv/jobs/{job_id}",
+        'result_url': f"/predict_csv/jobs/{job_id}/result",
+    }), 202
+
+@api.route('/predict_csv/jobs/<job_id>', methods=['GET'])
+def get_scoring_job(job_id):
+    job = scoring_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+def stream_job_results(paths, fmt):
+    """Concatenate a job's NDJSON part files, re-wrapped as one JSON document for fmt='json'."""
+    if fmt == 'json':
+        yield '{"predictions": ['
+    first = True
+    for path in paths:
+        with open(path) as part:
+            if fmt == 'ndjson':
+                yield from part
+                continue
+            for line in part:
+                yield ('' if first else ',') + line.rstrip('\n')
+                first = False
+    if fmt == 'json':
+        yield ']}'
+
+# ?format=ndjson (default, one JSON object per line) or ?format=json ({"predictions": [...]})
+@api.route('/predict_csv/jobs/<job_id>/result', methods=['GET'])
+def get_scoring_job_result(job_id):
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'error': "format must be 'ndjson' or 'json'"}), 400
+    job = scoring_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': f"Job is {job['status']}", 'job': job}), 409
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    response = Response(stream_job_results(scoring_jobs.result_paths(job_id), fmt), mimetype=mimetype)
+    extension = 'ndjson' if fmt == 'ndjson' else 'json'
+    response.headers['Content-Disposition'] = f'attachment; filename="predictions-{job_id}.{extension}"'
+    return response
+
+@api.route('/')
 def home():
     return "Diabetes Prediction Backend"
 
-@app.route('/register', methods=['POST'])
+@api.route('/ready')
+def ready():
+    active = model_registry.active
+    if active is None:
+        return jsonify({'ready': False, 'error': model_load_error}), 503
+    return jsonify({'ready': True, 'model_version': active.version})
+
+def busy_response():
+    response = jsonify({'message': 'Server busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def rehash_password(user_id, password):
+    """Re-hash with the current PASSWORD_HASH_ROUNDS after a successful login."""
+    try:
+        hashed_password = password_hasher.hash(password)
+        with DB_LATENCY.time(operation='rehash_password'), db.get_connection() as conn:
+            conn.execute("UPDATE users SET password = ? WHERE id = ?", (hashed_password, user_id))
+    except PasswordHasherBusy:
+        pass  # The old hash still verifies; try again on a later login
+
+@api.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -109,68 +394,74 @@ def register():
     if not username or not password:
         return jsonify({'message': 'Username and password required'}), 400
     
-    hashed_password = pbkdf2_sha256.hash(password)
+    try:
+        hashed_password = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return busy_response()
     
     try:
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with DB_LATENCY.time(operation='register'), db.get_connection() as conn:
             c = conn.cursor()
             c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_password))
             user_id = c.lastrowid
-            conn.commit()
         access_token = create_access_token(identity=str(user_id))
         return jsonify({'message': 'User registered successfully', 'token': access_token}), 201
     except sqlite3.IntegrityError:
         return jsonify({'message': 'Username already exists'}), 409
 
-@app.route('/login', methods=['POST'])
+@api.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
     password = data.get('password')
     
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with DB_LATENCY.time(operation='login'), db.get_connection() as conn:
         c = conn.cursor()
         c.execute("SELECT id, password FROM users WHERE username = ?", (username,))
         user = c.fetchone()
     
-    if user and pbkdf2_sha256.verify(password, user[1]):
+    try:
+        valid = bool(user) and password_hasher.verify(password, user[1])
+    except PasswordHasherBusy:
+        return busy_response()
+
+    if valid:
+        if password_hasher.needs_update(user[1]):
+            rehash_password(user[0], password)
         access_token = create_access_token(identity=str(user[0]))
         return jsonify({'token': access_token}), 200
     else:
         return jsonify({'message': 'Invalid credentials'}), 401
 
-@app.route('/predict', methods=['POST'])
+@api.route('/predict', methods=['POST'])
 @jwt_required(optional=True)
 def predict():
     try:
-        required_fields = [
-            'Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
-            'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age'
-        ]
-
         data = request.form
-        print(f"Received form data: {dict(data)}")
-        for field in required_fields:
+        for field in FEATURE_COLUMNS:
             if field not in data or not data[field]:
                 return jsonify({'message': f'Missing or empty field: {field}'}), 400
 
         try:
-            input_data = [
-                float(data['Pregnancies']),
-                float(data['Glucose']),
-                float(data['BloodPressure']),
-                float(data['SkinThickness']),
-                float(data['Insulin']),
-                float(data['BMI']),
-                float(data['DiabetesPedigreeFunction']),
-                float(data['Age'])
-            ]
+            input_data = [float(data[field]) for field in FEATURE_COLUMNS]
         except ValueError as e:
             return jsonify({'message': f'Invalid numeric value: {str(e)}'}), 400
 
-        input_array = np.asarray(input_data).reshape(1, -1)
-        prob = model.predict_proba(input_array)[0][1]
-        print(f"Prediction probability: {prob}")
+        active = model_registry.active
+        if active is None:
+            return jsonify({'message': 'Prediction failed: model not loaded'}), 503
+        probs = prediction_cache.get(active.version, input_data) if prediction_cache else None
+        cached = probs is not None
+        if not cached:
+            with INFERENCE_LATENCY.time(path='predict_batched' if batcher else 'predict'):
+                if batcher:
+                    probs = batcher.predict_proba(input_data, active).tolist()
+                else:
+                    input_array = np.asarray(input_data).reshape(1, -1)
+                    probs = active.predictor.predict_proba(input_array)[0].tolist()
+            if prediction_cache:
+                prediction_cache.put(active.version, input_data, probs)
+        prob = probs[1]
         
         if prob < 0.4:
             result = 'Not Diabetic'
@@ -188,27 +479,26 @@ def predict():
         sex = data['Sex']
         
         user_id = None
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        print(f"Received token: {token}")
         try:
             user_id = get_jwt_identity()
-            print(f"User ID: {user_id}")
         except Exception as e:
-            print(f"Error getting user_id: {e}")
+            request_log.debug("Could not read JWT identity", extra={'error': str(e)})
         
         if user_id:
             try:
-                with sqlite3.connect(DATABASE_PATH) as conn:
-                    c = conn.cursor()
-                    c.execute(
-                        "INSERT INTO predictions (user_id, prediction, glucose, blood_pressure, risk_percentage, diet_suggestion, sex) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                        (int(user_id), result, glucose, blood_pressure, risk_percentage, diet_suggestion, sex)
-                    )
-                    conn.commit()
-                    print(f"Prediction saved for user_id: {user_id}")
-            except Exception as e:
-                print(f"Error saving prediction to database: {e}")
+                # Committed by the background writer in a grouped transaction
+                db.get_prediction_writer().submit(
+                    (int(user_id), result, glucose, blood_pressure, risk_percentage, diet_suggestion, sex)
+                )
+            except Exception:
+                log.exception("Error queueing prediction for the database")
         
+        request_log.debug("Prediction made", extra={
+            'prediction': result,
+            'cached': cached,
+            'model_version': active.version,
+            'authenticated': bool(user_id),
+        })
         return jsonify({
             'prediction': result,
             'glucose': glucose,
@@ -218,34 +508,120 @@ def predict():
             'probability': prob
         })
     except Exception as e:
-        print(f"Error in predict endpoint: {e}")
+        log.exception("Error in predict endpoint")
         return jsonify({'message': f'Prediction failed: {str(e)}'}), 500
 
-@app.route('/history', methods=['GET'])
+HISTORY_SELECT = (
+    "SELECT prediction, glucose, blood_pressure, risk_percentage, diet_suggestion, timestamp, id "
+    "FROM predictions WHERE user_id = ?"
+)
+HISTORY_ORDER = " ORDER BY timestamp DESC, id DESC"
+HISTORY_MAX_LIMIT = 1000
+HISTORY_EXPORT_BATCH = 500
+
+
+def history_entry(row):
+    return {
+        'prediction': row[0],
+        'glucose': row[1],
+        'blood_pressure': row[2],
+        'risk_percentage': row[3],
+        'diet_suggestion': row[4],
+        'timestamp': row[5]
+    }
+
+
+def encode_history_cursor(row):
+    """Opaque keyset cursor pointing just past ``row`` in newest-first order."""
+    return base64.urlsafe_b64encode(f"{row[5]}|{row[6]}".encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+    return timestamp, int(row_id)
+
+
+def stream_history(user_id, fmt):
+    """Stream a user's full history from its own connection, a batch of rows at a time."""
+    conn = db.connect()
+    try:
+        c = conn.execute(HISTORY_SELECT + HISTORY_ORDER, (user_id,))
+        if fmt != 'ndjson':
+            yield '{"history": ['
+        first = True
+        while True:
+            rows = c.fetchmany(HISTORY_EXPORT_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                if fmt == 'ndjson':
+                    yield json.dumps(history_entry(row)) + '\n'
+                else:
+                    yield ('' if first else ',') + json.dumps(history_entry(row))
+                first = False
+        if fmt != 'ndjson':
+            yield ']}'
+    finally:
+        conn.close()
+
+
+# Without parameters the full history is returned, as before. ?limit=N pages
+# through it newest-first; pass the returned next_cursor back as ?before= to
+# get the following page. ?stream=ndjson|json streams a full export.
+@api.route('/history', methods=['GET'])
 @jwt_required()
 def get_history():
-    user_id = get_jwt_identity()
-    print(f"Fetching history for user_id: {user_id}")
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        c = conn.cursor()
-        c.execute(
-            "SELECT prediction, glucose, blood_pressure, risk_percentage, diet_suggestion, timestamp FROM predictions WHERE user_id = ? ORDER BY timestamp DESC",
-            (int(user_id),)
-        )
-        history = [
-            {
-                'prediction': row[0],
-                'glucose': row[1],
-                'blood_pressure': row[2],
-                'risk_percentage': row[3],
-                'diet_suggestion': row[4],
-                'timestamp': row[5]
-            } for row in c.fetchall()
-        ]
-        print(f"History fetched: {history}")
-    return jsonify({'history': history}), 200
+    user_id = int(get_jwt_identity())
+    # Make predictions still waiting in the write-behind queue visible
+    with DB_LATENCY.time(operation='history_flush'):
+        flushed = db.get_prediction_writer().flush(timeout=HISTORY_FLUSH_TIMEOUT)
+    if not flushed:
+        # Serve what is committed rather than hang on a stuck writer
+        log.warning("History served before queued predictions were written", extra={'user_id': user_id})
 
-@app.route('/recommend', methods=['POST'])
+    stream = request.args.get('stream')
+    if stream is not None:
+        if stream not in ('ndjson', 'json'):
+            return jsonify({'message': "stream must be 'ndjson' or 'json'"}), 400
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        return Response(stream_history(user_id, stream), mimetype=mimetype)
+
+    query, params = HISTORY_SELECT, [user_id]
+    limit = request.args.get('limit')
+    before = request.args.get('before')
+    try:
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= HISTORY_MAX_LIMIT:
+                raise ValueError(f"limit must be between 1 and {HISTORY_MAX_LIMIT}")
+        if before:
+            query += " AND (timestamp, id) < (?, ?)"
+            params.extend(decode_history_cursor(before))
+    except ValueError as e:
+        return jsonify({'message': f'Invalid pagination parameter: {str(e)}'}), 400
+
+    query += HISTORY_ORDER
+    if limit is not None:
+        # One extra row tells us whether another page exists
+        query += " LIMIT ?"
+        params.append(limit + 1)
+
+    with DB_LATENCY.time(operation='history'), db.get_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1])
+    history = [history_entry(row) for row in rows]
+    request_log.debug("History fetched", extra={'entries': len(history), 'paged': limit is not None})
+    return jsonify({'history': history, 'next_cursor': next_cursor}), 200
+
+# Stateless, so one advisor serves every request
+nutrition_advisor = DiabetesNutritionAdvisor()
+RECOMMEND_FIELDS = ['Age', 'Height', 'Weight', 'Sex', 'ActivityLevel', 'Goal']
+
+@api.route('/recommend', methods=['POST'])
 def recommend():
     try:
         data = request.form
@@ -257,22 +633,158 @@ def recommend():
         goal = data['Goal']
         diabetic = data['Diabetic'].lower() == 'true'
 
-        advisor = DiabetesNutritionAdvisor()
-        recommendations = advisor.get_nutrition_recommendations(age, height, weight, sex, activity_level, goal, diabetic)
+        recommendations = nutrition_advisor.get_nutrition_recommendations(age, height, weight, sex, activity_level, goal, diabetic)
 
         return jsonify(recommendations)
     except ValueError as e:
-        print(f"Validation error in recommend endpoint: {e}")
+        request_log.info("Validation error in recommend endpoint", extra={'error': str(e)})
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"Error in recommend endpoint: {e}")
+        log.exception("Error in recommend endpoint")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/model_accuracy', methods=['GET'])
+# Cohort version of /recommend. Accepts a CSV upload ('file') or a JSON list
+# of records (optionally wrapped as {"records": [...]}) with the /recommend
+# field names; returns one result or {"error": ...} per row, in order.
+@api.route('/recommend_batch', methods=['POST'])
+def recommend_batch():
+    try:
+        file = request.files.get('file')
+        if file:
+            import pandas as pd
+            records = pd.read_csv(file.stream)
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('records')
+            if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+                return jsonify({'error': 'Expected a CSV file or a JSON list of records'}), 400
+            records = {field: [row.get(field) for row in data] for field in RECOMMEND_FIELDS + ['Diabetic']}
+
+        missing = [field for field in RECOMMEND_FIELDS if field not in records]
+        if missing:
+            return jsonify({'error': f"Missing required columns: {', '.join(missing)}"}), 400
+
+        recommendations = nutrition_advisor.get_nutrition_recommendations_batch(records)
+        return jsonify({'recommendations': recommendations})
+    except ValueError as e:
+        request_log.info("Validation error in recommend_batch endpoint", extra={'error': str(e)})
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log.exception("Error in recommend_batch endpoint")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/predict/batching', methods=['GET'])
+def get_batching_stats():
+    if batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **batcher.stats()})
+
+@api.route('/predict/cache', methods=['GET'])
+def get_cache_stats():
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **prediction_cache.stats()})
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        # The URL rule, not the path, so ids in URLs do not create new series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        request_log.debug("Request handled", extra={
+            'method': request.method,
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(elapsed * 1000, 3),
+        })
+    return response
+
+def collect_service_metrics():
+    """Cache, batching, password-hashing and model stats for /metrics."""
+    families = []
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        for name in ('hits', 'misses', 'evictions', 'invalidations'):
+            families.append((f'prediction_cache_{name}', 'counter', f'Prediction cache {name}.',
+                             [(f'prediction_cache_{name}_total', (), stats[name])]))
+        families.append(('prediction_cache_entries', 'gauge', 'Entries in the prediction cache.',
+                         [('prediction_cache_entries', (), stats['entries'])]))
+    if batcher is not None:
+        stats = batcher.stats()
+        samples = []
+        sizes = stats['batch_size_counts']
+        for bound in (1, 2, 4, 8, 16, 32, 64, 128):
+            cumulative = sum(count for size, count in sizes.items() if size <= bound)
+            samples.append(('predict_batch_size_bucket', (('le', str(bound)),), cumulative))
+        samples += [
+            ('predict_batch_size_bucket', (('le', '+Inf'),), stats['batches']),
+            ('predict_batch_size_sum', (), stats['rows']),
+            ('predict_batch_size_count', (), stats['batches']),
+        ]
+        families.append(('predict_batch_size', 'histogram', 'Rows per coalesced predict_proba call.', samples))
+        families.append(('predict_batch_queued', 'gauge', 'Rows waiting for the batcher.',
+                         [('predict_batch_queued', (), stats['queued'])]))
+    if password_hasher is not None:
+        families.append(('password_hash_rejected', 'counter', 'Password operations refused because the pool was full.',
+                         [('password_hash_rejected_total', (), password_hasher.rejected)]))
+    active = model_registry.active if model_registry is not None else None
+    families.append(('model_ready', 'gauge', 'Whether a model is loaded, labelled with its version.',
+                     [('model_ready', (('version', active.version if active else ''),), int(active is not None))]))
+    return families
+
+# Prometheus text format; each worker process reports its own numbers
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(instrumentation.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/model_accuracy', methods=['GET'])
 def get_model_accuracy():
-    if model_accuracy is None:
+    active = model_registry.active
+    if active is None or active.accuracy is None:
         return jsonify({"error": "Model accuracy not available"}), 500
-    return jsonify({"accuracy": f"{model_accuracy:.2f}%"})
+    return jsonify({"accuracy": f"{active.accuracy:.2f}%", "version": active.version})
+
+def check_admin_token():
+    """None if the request carries MODEL_ADMIN_TOKEN, else an error response."""
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({'error': 'Model administration is disabled; set MODEL_ADMIN_TOKEN'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), MODEL_ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+@api.route('/admin/models', methods=['GET'])
+def list_models():
+    denied = check_admin_token()
+    if denied:
+        return denied
+    active = model_registry.active
+    return jsonify({
+        'active': active.version if active else None,
+        'versions': model_registry.versions()
+    })
+
+# Loads and warms the requested version, then swaps it in; requests already
+# running finish on the previous model. Other workers follow via the ACTIVE file.
+@api.route('/admin/models/activate', methods=['POST'])
+def activate_model():
+    denied = check_admin_token()
+    if denied:
+        return denied
+    version = (request.get_json(silent=True) or {}).get('version')
+    if not version:
+        return jsonify({'error': 'version is required'}), 400
+    try:
+        active = model_registry.activate(version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': f'Could not load model version {version}: {str(e)}'}), 500
+    return jsonify({'active': active.version, 'metrics': active.metrics})
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
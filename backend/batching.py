@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class PredictionBatcher:
+    """Coalesce concurrent single-row predictions into batched predict_proba calls.
+
+    Callers block in ``predict_proba(row, model)`` while a background thread gathers
+    every row that arrives within ``max_wait_ms`` of the first one (or until
+    ``max_batch`` rows are queued), scores them with one call and hands each
+    caller back its own row of probabilities.
+
+    Each row is queued with the model the caller chose, and a batch is split
+    so every row is scored by exactly that model: ``predict_proba(model,
+    rows)`` is called once per distinct model in the batch. A request that
+    captured a model just before a hot swap is therefore never answered by
+    the new one.
+    """
+
+    def __init__(self, predict_proba, max_wait_ms=2.0, max_batch=32):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms cannot be negative")
+        self._predict_proba = predict_proba
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._batches = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._size_counts = {}
+        self._closed = False
+
+        self._start()
+        # A forked worker inherits the batcher but not its thread
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+        self._thread.start()
+
+    def predict_proba(self, row, model, timeout=None):
+        """Score one feature row with ``model`` and return its class probabilities."""
+        if self._closed:
+            raise RuntimeError("PredictionBatcher is closed")
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float64).ravel(), model, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes."""
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return None
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Score what we already have, then let _run see the shutdown marker
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Almost always one group; two only while a model swap is in flight
+            groups = {}
+            for row, model, future in batch:
+                groups.setdefault(id(model), (model, []))[1].append((row, future))
+            for model, items in groups.values():
+                rows = np.vstack([row for row, _ in items])
+                try:
+                    probs = self._predict_proba(model, rows)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                else:
+                    for (_, future), prob in zip(items, probs):
+                        future.set_result(prob)
+            self._record(len(batch))
+
+    def _record(self, size):
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += size
+            self._largest_batch = max(self._largest_batch, size)
+            self._size_counts[size] = self._size_counts.get(size, 0) + 1
+
+    def stats(self):
+        """Batch-size metrics since startup."""
+        with self._stats_lock:
+            return {
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_batch': self.max_batch,
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'largest_batch': self._largest_batch,
+                'batch_size_counts': dict(sorted(self._size_counts.items())),
+                'queued': self._queue.qsize(),
+            }
+
+    def close(self, timeout=5.0):
+        """Finish the requests already queued and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,151 @@
+"""Stored benchmark baselines and the comparison report shared by micro.py and load.py.
+
+A baseline is ``baselines/<suite>.json``: the results of one run plus the
+machine it ran on. Results map a benchmark name to its metrics; names
+ending in ``_ms`` are latencies (lower is better) and ``rps`` is throughput
+(higher is better). Other metrics are shown but never flagged, and so are
+latency changes smaller than ``min_delta_ms``, which are timer noise.
+
+A run may also record its context: what a group of benchmarks depended on
+besides the code, keyed by benchmark-name prefix (e.g. the model behind
+``inference.``). Benchmarks whose context differs from the baseline's are
+reported but not compared, since a different model is not a regression.
+"""
+import json
+import os
+import platform
+import time
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def baseline_path(suite):
+    return os.path.join(BASELINE_DIR, f"{suite}.json")
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def model_context(active):
+    """Context entry for benchmarks that score with ``active`` (a model_registry.ActiveModel)."""
+    if active is None:
+        return None
+    return {'model_version': active.version, 'model_type': type(active.model).__name__}
+
+
+def save_baseline(suite, results, path=None, context=None):
+    """Store ``results``, keeping the stored numbers for benchmarks this run skipped."""
+    path = path or baseline_path(suite)
+    previous = load_baseline(suite, path) or {}
+    results = {**previous.get('results', {}), **results}
+    context = {**previous.get('context', {}), **(context or {})}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'suite': suite,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': machine_info(),
+            'context': context,
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
+
+
+def load_baseline(suite, path=None):
+    path = path or baseline_path(suite)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _direction(metric):
+    if metric.endswith('_ms'):
+        return -1
+    if metric == 'rps':
+        return 1
+    return 0
+
+
+def changed_context(context, baseline):
+    """{prefix: (baseline value, current value)} for the context entries that differ."""
+    stored = baseline.get('context', {})
+    return {prefix: (stored.get(prefix), value) for prefix, value in (context or {}).items()
+            if stored.get(prefix) != value}
+
+
+def compare(results, baseline, threshold=0.20, min_delta_ms=0.01, skip_prefixes=()):
+    """Rows of (benchmark, metric, baseline, current, change, regressed)."""
+    rows = []
+    for name, metrics in sorted(results.items()):
+        if name.startswith(tuple(skip_prefixes)):
+            continue
+        previous = baseline['results'].get(name, {})
+        for metric, value in metrics.items():
+            before = previous.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            change = (value - before) / before if before else 0.0
+            regressed = _direction(metric) * change < -threshold
+            if metric.endswith('_ms') and abs(value - before) < min_delta_ms:
+                regressed = False
+            rows.append((name, metric, before, value, change, regressed))
+    return rows
+
+
+def _describe(value):
+    if not value:
+        return 'nothing'
+    if isinstance(value, dict):
+        return ', '.join(f"{key}={item}" for key, item in sorted(value.items()))
+    return str(value)
+
+
+def print_report(rows, baseline, threshold, changed=None):
+    """Print the comparison table; returns the number of regressions."""
+    print(f"\nCompared with the baseline from {baseline['created']} "
+          f"({baseline['machine'].get('cpus')} CPUs, Python {baseline['machine'].get('python')}); "
+          f"changes worse than {threshold:.0%} are flagged")
+    if baseline['machine'] != machine_info():
+        print("note: the baseline was recorded on a different machine, so absolute numbers may not compare")
+    for prefix, (before, current) in sorted((changed or {}).items()):
+        print(f"note: {prefix}* ran with {_describe(current)}, but the baseline recorded {_describe(before)}; "
+              f"those benchmarks are not compared")
+    print(f"{'benchmark':<34}{'metric':<10}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, metric, before, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<34}{metric:<10}{before:>12.3f}{value:>12.3f}{change:>+10.1%}{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regression(s)")
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--baseline', help='baseline file (default: benchmarks/baselines/<suite>.json)')
+    parser.add_argument('--threshold', type=float, default=0.20, help='relative change reported as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.01,
+                        help='latency changes smaller than this are never regressions')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+
+
+def finish(suite, results, args, context=None):
+    """Save or compare against the baseline as the command line asked; returns the exit status."""
+    if args.save_baseline:
+        print(f"\nbaseline saved to {save_baseline(suite, results, args.baseline, context)}")
+        return 0
+    baseline = load_baseline(suite, args.baseline)
+    if baseline is None:
+        print("\nno baseline yet; run with --save-baseline to record one")
+        return 0
+    changed = changed_context(context, baseline)
+    rows = compare(results, baseline, args.threshold, args.min_delta_ms, skip_prefixes=changed)
+    regressions = print_report(rows, baseline, args.threshold, changed)
+    return 1 if regressions and args.fail_on_regression else 0
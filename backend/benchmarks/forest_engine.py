@@ -0,0 +1,63 @@
+"""Check CompiledForest against sklearn and compare their latency.
+
+Usage: python benchmarks/forest_engine.py [path/to/rmodel.pkl]
+
+The full equivalence check, which needs no trained model and covers missing
+values, is tests/test_forest_engine.py (run with pytest).
+"""
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from forest_engine import CompiledForest  # noqa: E402
+
+
+def time_call(fn, X, repeat):
+    """Median wall time of ``fn(X)`` in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BACKEND_DIR, 'rmodel.pkl')
+    model = joblib.load(model_path)
+    engine = CompiledForest.from_sklearn(model)
+    # Skip the native fallback so equivalence covers the array traversal at every size
+    array_engine = CompiledForest.from_sklearn(model, native_batch_rows=None)
+
+    data = pd.read_csv(os.path.join(BACKEND_DIR, 'diabetes.csv')).drop(columns=['Outcome'])
+    X = data.to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(42)
+    X_random = rng.uniform(X.min(axis=0), X.max(axis=0), size=(5000, X.shape[1]))
+
+    # Equivalence: same probabilities and labels as sklearn on real and synthetic rows
+    for name, sample in (('diabetes.csv', X), ('random', X_random)):
+        expected = model.predict_proba(sample)
+        actual = array_engine.predict_proba(sample)
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(array_engine.predict(sample), model.predict(sample))
+        print(f"equivalent on {name}: {len(sample)} rows, max abs diff {np.abs(actual - expected).max():.2e}")
+
+    # Latency: single rows (the /predict path) up to /predict_csv sized batches
+    print(f"{'rows':>6}{'sklearn ms':>12}{'array ms':>12}{'engine ms':>12}{'speedup':>10}")
+    for n_rows, repeat in ((1, 200), (8, 100), (64, 50), (512, 20), (4096, 5)):
+        sample = np.resize(X, (n_rows, X.shape[1]))
+        sk = time_call(model.predict_proba, sample, repeat)
+        ar = time_call(array_engine.predict_proba, sample, repeat)
+        en = time_call(engine.predict_proba, sample, repeat)
+        print(f"{n_rows:>6}{sk:>12.3f}{ar:>12.3f}{en:>12.3f}{sk / en:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
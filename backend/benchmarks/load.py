@@ -0,0 +1,216 @@
+"""Load generator for the backend endpoints, reporting p50/p95/p99 latency and throughput.
+
+Usage: python benchmarks/load.py [--scenarios predict,login,...] [--seconds N] [--concurrency N]
+                                 [--url http://127.0.0.1:5000] [--save-baseline | --fail-on-regression]
+
+By default the app runs in-process behind the Flask test client, on a
+temporary database seeded with a user whose history has --history-rows
+predictions. With --url the same requests go to a running server instead;
+a fresh user is registered there for the authenticated scenarios. The
+served model version is stored with the baseline, and /predict numbers are
+only compared against a baseline taken on the same model. The in-process
+app runs without the prediction cache unless PREDICTION_CACHE_SIZE is set,
+so predict times the model; a --url server should be started with
+PREDICTION_CACHE_SIZE=0 for the same reason.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+import baseline  # noqa: E402
+
+SCENARIOS = ('predict', 'predict_csv', 'history', 'recommend', 'login')
+
+
+class TestClientTarget:
+    """Requests through the Flask test client of an in-process app."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def send(self, method, path, form=None, json_body=None, file=None, headers=None):
+        data = form
+        if file is not None:
+            data = {'file': (io.BytesIO(file), 'upload.csv')}
+        response = self.app.test_client().open(path, method=method, data=data, json=json_body, headers=headers)
+        body = response.get_data()
+        return response.status_code, body
+
+
+class HttpTarget:
+    """Requests over HTTP to a running server."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def send(self, method, path, form=None, json_body=None, file=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif file is not None:
+            boundary = uuid.uuid4().hex
+            data = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="upload.csv"\r\n'
+                    f'Content-Type: text/csv\r\n\r\n').encode() + file + f'\r\n--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def make_scenarios(target, token, username, password, patients, csv_bytes):
+    """One callable per scenario; each sends a request and returns its status code."""
+    auth = {'Authorization': f'Bearer {token}'}
+    forms = [dict(zip(patients.columns[1:], map(str, row)), Sex='female')
+             for row in patients.iloc[:, 1:].itertuples(index=False)]
+    counter = itertools.count()
+
+    def predict():
+        return target.send('POST', '/predict', form=forms[next(counter) % len(forms)], headers=auth)[0]
+
+    def predict_csv():
+        return target.send('POST', '/predict_csv', file=csv_bytes)[0]
+
+    def history():
+        return target.send('GET', '/history?limit=50', headers=auth)[0]
+
+    def recommend():
+        return target.send('POST', '/recommend', form={
+            'Age': '45', 'Height': '1.7', 'Weight': '80', 'Sex': 'female',
+            'ActivityLevel': 'moderate', 'Goal': 'standard', 'Diabetic': 'true'})[0]
+
+    def login():
+        return target.send('POST', '/login', json_body={'username': username, 'password': password})[0]
+
+    return {'predict': predict, 'predict_csv': predict_csv, 'history': history,
+            'recommend': recommend, 'login': login}
+
+
+def run_scenario(fn, seconds, concurrency, warmup=3):
+    """Call ``fn`` from ``concurrency`` threads for ``seconds``; returns latency percentiles and throughput."""
+    for _ in range(warmup):
+        fn()
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = fn()
+            local.append((time.perf_counter() - start) * 1000)
+            failed += not 200 <= status < 300
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'rps': len(latencies) / elapsed,
+        'requests': len(latencies),
+        'errors': errors[0],
+    }
+
+
+def remote_model(target):
+    """Context entry for the model a running server reports, as far as /model_accuracy tells."""
+    status, body = target.send('GET', '/model_accuracy')
+    return {'model_version': json.loads(body).get('version') if status == 200 else None}
+
+
+def local_target(tmp, history_rows):
+    """Start the app in-process on a seeded temporary database; returns (target, username, password, model)."""
+    os.environ.update(
+        DATABASE_PATH=os.path.join(tmp, 'bench.db'), JOBS_DIR=os.path.join(tmp, 'jobs'),
+        MODEL_WATCH_INTERVAL='0', LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'),
+        # predict cycles through a fixed set of forms, so a cache would turn it into a hit-rate test
+        PREDICTION_CACHE_SIZE=os.environ.get('PREDICTION_CACHE_SIZE', '0'),
+    )
+    # db reads DATABASE_PATH on import, so these come after the environment is set
+    import synthetic
+    import app
+
+    usernames = synthetic.seed_history(os.environ['DATABASE_PATH'], users=1, per_user=history_rows)
+    target = TestClientTarget(app.create_app(preload_model=True))
+    return target, usernames[0], synthetic.BENCHMARK_PASSWORD, baseline.model_context(app.model_registry.active)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset of ' + ', '.join(SCENARIOS))
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration of each scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--csv-rows', type=int, default=1000, help='rows per /predict_csv upload')
+    parser.add_argument('--history-rows', type=int, default=10000, help='predictions in the seeded history')
+    parser.add_argument('--url', help='benchmark a running server instead of an in-process app')
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            target = HttpTarget(args.url)
+            username, password = f"load-{uuid.uuid4().hex[:8]}", 'benchmark'
+            status, _ = target.send('POST', '/register', json_body={'username': username, 'password': password})
+            if status != 201:
+                raise SystemExit(f"could not register a benchmark user (HTTP {status})")
+            model = remote_model(target)
+        else:
+            target, username, password, model = local_target(tmp, args.history_rows)
+        import synthetic
+
+        status, body = target.send('POST', '/login', json_body={'username': username, 'password': password})
+        if status != 200:
+            raise SystemExit(f"could not log in as {username} (HTTP {status})")
+        patients = synthetic.make_patients(max(args.csv_rows, 1000))
+        csv_bytes = patients.iloc[:args.csv_rows].to_csv(index=False).encode()
+        scenarios = make_scenarios(target, json.loads(body)['token'], username, password, patients, csv_bytes)
+
+        results = {}
+        print(f"{'scenario':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+        for name in selected:
+            result = results[f'load.{name}'] = run_scenario(scenarios[name], args.seconds, args.concurrency)
+            print(f"{name:<22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                  f"{result['rps']:>10.1f}{result['errors']:>8}")
+    # /predict and /predict_csv timings depend on the model being served
+    sys.exit(baseline.finish('load', results, args, {'load.predict': model}))
+
+
+if __name__ == '__main__':
+    main()
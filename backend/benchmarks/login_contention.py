@@ -0,0 +1,103 @@
+"""Measure /predict latency while other clients hammer /login.
+
+Runs the same load twice in fresh interpreters: once hashing inline on the
+request threads (PASSWORD_HASH_WORKERS=0) and once with the process pool,
+and prints /predict p50/p95 and /login throughput for each.
+
+Usage: python benchmarks/login_contention.py [--seconds N] [--login-threads N] [--workers N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs in the child interpreter; prints one JSON object of results
+PROBE = r'''
+import json, sys, threading, time
+import numpy as np
+import app
+
+def main(seconds, login_threads):
+    application = app.create_app(preload_model=True)
+    application.testing = True
+    with application.test_client() as client:
+        client.post('/register', json={'username': 'bench', 'password': 'secret'})
+    form = dict(Pregnancies='2', Glucose='120', BloodPressure='70', SkinThickness='20', Insulin='85',
+                BMI='32.5', DiabetesPedigreeFunction='0.5', Age='25', Sex='female')
+    stop = threading.Event()
+    logins = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def hammer():
+        client = application.test_client()
+        while not stop.is_set():
+            status = client.post('/login', json={'username': 'bench', 'password': 'secret'}).status_code
+            with lock:
+                logins['ok' if status == 200 else 'busy'] += 1
+
+    threads = [threading.Thread(target=hammer, daemon=True) for _ in range(login_threads)]
+    for thread in threads:
+        thread.start()
+    client = application.test_client()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = client.post('/predict', data=form)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(json.dumps({
+        'predict_p50_ms': float(np.percentile(latencies, 50)),
+        'predict_p95_ms': float(np.percentile(latencies, 95)),
+        'predicts': len(latencies),
+        'logins_per_s': logins['ok'] / seconds,
+        'logins_busy': logins['busy'],
+    }))
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]), int(sys.argv[2]))
+'''
+
+
+def run_once(env, seconds, login_threads):
+    with tempfile.NamedTemporaryFile('w', suffix='.py', dir=BACKEND_DIR, delete=False) as f:
+        f.write(PROBE)
+    try:
+        result = subprocess.run(
+            [sys.executable, f.name, str(seconds), str(login_threads)], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=False
+        )
+    finally:
+        os.remove(f.name)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2, help='pool size for the offloaded run')
+    args = parser.parse_args()
+
+    print(f"{'hashing':<12}{'p50 ms':>10}{'p95 ms':>10}{'predicts':>10}{'logins/s':>10}{'busy':>8}")
+    for label, workers in (('inline', 0), ('pool', args.workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            # The probe repeats one /predict body, so the prediction cache would answer it
+            env = dict(os.environ, DATABASE_PATH=os.path.join(tmp, 'bench.db'), MODEL_WATCH_INTERVAL='0',
+                       PASSWORD_HASH_WORKERS=str(workers), PREDICTION_CACHE_SIZE='0', PYTHONWARNINGS='ignore')
+            result = run_once(env, args.seconds, args.login_threads)
+        print(f"{label:<12}{result['predict_p50_ms']:>10.2f}{result['predict_p95_ms']:>10.2f}"
+              f"{result['predicts']:>10}{result['logins_per_s']:>10.1f}{result['logins_busy']:>8}")
+
+
+if __name__ == '__main__':
+    main()
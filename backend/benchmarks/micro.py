@@ -0,0 +1,162 @@
+"""Micro-benchmarks for model inference, the nutrition calculations and the DB queries.
+
+Usage: python benchmarks/micro.py [--only inference,nutrition,db] [--repeat N]
+                                  [--save-baseline | --fail-on-regression]
+
+Each benchmark reports p50/p95 milliseconds per call. The model is whatever
+the backend would serve (MODEL_REGISTRY_DIR / MODEL_PATH); its version and
+type are stored with the baseline, so inference numbers are only compared
+against a baseline taken on the same model. The DB
+benchmarks run the /login and /history queries against a temporary
+database seeded by synthetic.py.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+import baseline  # noqa: E402
+import db  # noqa: E402
+import synthetic  # noqa: E402
+from app import HISTORY_ORDER, HISTORY_SELECT  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from nutrition_recommendation import DiabetesNutritionAdvisor  # noqa: E402
+
+SUITES = ('inference', 'nutrition', 'db')
+
+
+def measure(fn, repeat, warmup=5, min_sample_ms=1.0):
+    """p50/p95 wall time of one ``fn()`` call in milliseconds.
+
+    Calls faster than ``min_sample_ms`` are timed in groups, as timeit does,
+    so clock resolution and scheduler noise do not swamp them.
+    """
+    for _ in range(warmup):
+        fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if (time.perf_counter() - start) * 1000 >= min_sample_ms or number >= 1 << 16:
+            break
+        number *= 2
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    return {'p50_ms': float(np.percentile(timings, 50)), 'p95_ms': float(np.percentile(timings, 95))}
+
+
+def bench_inference(repeat):
+    """Results plus the baseline context naming the model they were measured on."""
+    registry = ModelRegistry(
+        os.environ.get('MODEL_REGISTRY_DIR', os.path.join(BACKEND_DIR, 'models')),
+        os.environ.get('MODEL_PATH', os.path.join(BACKEND_DIR, 'rmodel.pkl')),
+    )
+    active = registry.load_active()
+    if active is None:
+        raise SystemExit("No model to benchmark; train one with train.py first")
+    patients = synthetic.make_patients(10000)[synthetic.FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    results = {}
+    for rows in (1, 100, 10000):
+        X = patients[:rows]
+        results[f'inference.served.{rows}_rows'] = measure(lambda: active.predictor.predict_proba(X), repeat)
+        results[f'inference.sklearn.{rows}_rows'] = measure(lambda: active.model.predict_proba(X), repeat)
+    return results, {'inference.': baseline.model_context(active)}
+
+
+def bench_nutrition(repeat):
+    advisor = DiabetesNutritionAdvisor()
+    cohort = synthetic_cohort(10000)
+    return {
+        'nutrition.scalar': measure(
+            lambda: advisor.get_nutrition_recommendations(45, 1.7, 80, 'female', 'moderate', 'standard', True), repeat),
+        'nutrition.batch_10000_rows': measure(
+            lambda: advisor.get_nutrition_recommendations_batch(cohort), max(10, repeat // 10)),
+    }
+
+
+def synthetic_cohort(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return {
+        'Age': rng.integers(18, 90, rows).tolist(),
+        'Height': rng.uniform(1.4, 2.1, rows).round(2).tolist(),
+        'Weight': rng.uniform(40, 150, rows).round(1).tolist(),
+        'Sex': rng.choice(['male', 'female'], rows).tolist(),
+        'ActivityLevel': rng.choice(['low', 'moderate', 'high'], rows).tolist(),
+        'Goal': rng.choice(['cutting', 'bulking', 'standard'], rows).tolist(),
+        'Diabetic': rng.choice(['true', 'false'], rows).tolist(),
+    }
+
+
+def bench_db(repeat, history_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        usernames = synthetic.seed_history(path, users=3, per_user=history_rows)
+        conn = db.connect(path)
+        try:
+            user_id = conn.execute("SELECT id FROM users WHERE username = ?", (usernames[0],)).fetchone()[0]
+            page_query = HISTORY_SELECT + HISTORY_ORDER + " LIMIT 51"
+            deep_query = HISTORY_SELECT + " AND (timestamp, id) < (?, ?)" + HISTORY_ORDER + " LIMIT 51"
+            deep_row = conn.execute(HISTORY_SELECT + HISTORY_ORDER + " LIMIT 1 OFFSET ?",
+                                    (user_id, history_rows * 9 // 10)).fetchone()
+            # The (timestamp, id) pair a ?before= cursor deep into the history decodes to
+            deep_params = [user_id, deep_row[5], deep_row[6]]
+            rows = [(user_id, 'Not Diabetic', 120.0, 70.0, 12.5, 'Synthetic diet suggestion', 'female')] * 256
+
+            def insert_batch():
+                with conn:
+                    conn.executemany(db.PREDICTION_INSERT, rows)
+
+            return {
+                'db.login_lookup': measure(lambda: conn.execute(
+                    "SELECT id, password FROM users WHERE username = ?", (usernames[0],)).fetchone(), repeat),
+                'db.history_first_page': measure(lambda: conn.execute(page_query, (user_id,)).fetchall(), repeat),
+                'db.history_deep_page': measure(lambda: conn.execute(deep_query, deep_params).fetchall(), repeat),
+                f'db.history_full_{history_rows}_rows': measure(
+                    lambda: conn.execute(HISTORY_SELECT + HISTORY_ORDER, (user_id,)).fetchall(), max(10, repeat // 10)),
+                'db.insert_batch_256_rows': measure(insert_batch, max(10, repeat // 10)),
+            }
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', default=','.join(SUITES), help='comma-separated subset of ' + ', '.join(SUITES))
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--history-rows', type=int, default=20000, help='predictions per seeded user')
+    baseline.add_arguments(parser)
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    results, context = {}, {}
+    if 'inference' in selected:
+        inference, context = bench_inference(args.repeat)
+        results.update(inference)
+    if 'nutrition' in selected:
+        results.update(bench_nutrition(args.repeat))
+    if 'db' in selected:
+        results.update(bench_db(args.repeat, args.history_rows))
+
+    print(f"{'benchmark':<34}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, metrics in results.items():
+        print(f"{name:<34}{metrics['p50_ms']:>10.3f}{metrics['p95_ms']:>10.3f}")
+    sys.exit(baseline.finish('micro', results, args, context))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Check DiabetesNutritionAdvisor's batch API against the scalar methods and time both.
+
+Usage: python benchmarks/nutrition_batch.py [n_rows]
+"""
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from nutrition_recommendation import DiabetesNutritionAdvisor  # noqa: E402
+
+
+def make_cohort(n_rows, seed=42):
+    """Random /recommend records, including invalid activity levels."""
+    rng = random.Random(seed)
+    records = {field: [] for field in ('Age', 'Height', 'Weight', 'Sex', 'ActivityLevel', 'Goal', 'Diabetic')}
+    for _ in range(n_rows):
+        records['Age'].append(rng.choice([rng.randint(18, 90), round(rng.uniform(18, 90), 1)]))
+        records['Height'].append(round(rng.uniform(1.4, 2.1), rng.choice([2, 3])))
+        records['Weight'].append(round(rng.uniform(40, 150), rng.choice([0, 1, 2])))
+        records['Sex'].append(rng.choice(['male', 'Female', 'MALE', 'female']))
+        records['ActivityLevel'].append(rng.choice(['low', 'Moderate', 'medium', 'High', 'unknown']))
+        records['Goal'].append(rng.choice(['cutting', 'Bulking', 'standard']))
+        records['Diabetic'].append(rng.choice(['true', 'False', True, False]))
+    return records
+
+
+def scalar_recommendations(advisor, records):
+    results = []
+    for i in range(len(records['Age'])):
+        diabetic = records['Diabetic'][i]
+        if not isinstance(diabetic, bool):
+            diabetic = diabetic.lower() == 'true'
+        try:
+            results.append(advisor.get_nutrition_recommendations(
+                records['Age'][i], records['Height'][i], records['Weight'][i], records['Sex'][i],
+                records['ActivityLevel'][i], records['Goal'][i], diabetic
+            ))
+        except ValueError as e:
+            results.append({'error': str(e)})
+    return results
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    advisor = DiabetesNutritionAdvisor()
+    records = make_cohort(n_rows)
+
+    start = time.perf_counter()
+    expected = scalar_recommendations(advisor, records)
+    scalar_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    actual = advisor.get_nutrition_recommendations_batch(records)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = [i for i, (a, e) in enumerate(zip(actual, expected)) if a != e]
+    assert not mismatches, f"{len(mismatches)} rows differ, first at {mismatches[0]}: {actual[mismatches[0]]} != {expected[mismatches[0]]}"
+    print(f"batch results identical to scalar methods on {n_rows} rows")
+    print(f"scalar: {scalar_ms:.1f} ms, batch: {batch_ms:.1f} ms ({scalar_ms / batch_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Measure backend cold start: module import, create_app(), model readiness and first /predict.
+
+Each run uses a fresh interpreter, so imports are really cold.
+
+Usage: python benchmarks/startup.py [--runs N] [--output results.jsonl]
+
+With --output, the medians are appended as one JSON line, so the numbers
+can be tracked from release to release.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs in the child interpreter; prints one JSON object of timings in milliseconds
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy_on_import = sorted(name for name in ('pandas', 'joblib', 'sklearn') if name in sys.modules)
+application = app.create_app()
+created = time.perf_counter()
+client = application.test_client()
+while client.get('/ready').status_code != 200:
+    if app.model_load_error:
+        sys.exit("model failed to load: " + app.model_load_error)
+    time.sleep(0.005)
+ready = time.perf_counter()
+form = dict(Pregnancies='2', Glucose='120', BloodPressure='70', SkinThickness='20', Insulin='85',
+            BMI='32.5', DiabetesPedigreeFunction='0.5', Age='25', Sex='female')
+response = client.post('/predict', data=form)
+assert response.status_code == 200, response.get_data(as_text=True)
+predicted = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'ready_ms': (ready - start) * 1000,
+    'first_predict_ms': (predicted - ready) * 1000,
+    'heavy_on_import': heavy_on_import,
+}))
+'''
+
+
+def run_once(env):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='append the summary as a JSON line to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DATABASE_PATH=os.path.join(tmp, 'bench.db'),
+                   MODEL_WATCH_INTERVAL='0', PYTHONWARNINGS='ignore')
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    summary = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'runs': args.runs,
+    }
+    print(f"{'phase':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for key in ('import_ms', 'create_app_ms', 'ready_ms', 'first_predict_ms'):
+        values = [run[key] for run in runs]
+        summary[key] = round(statistics.median(values), 2)
+        print(f"{key[:-3]:<18}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+    heavy = sorted({name for run in runs for name in run['heavy_on_import']})
+    summary['heavy_on_import'] = heavy
+    print(f"heavy modules imported by 'import app': {', '.join(heavy) or 'none'}")
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        print(f"appended to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Generate synthetic benchmark data from diabetes.csv.
+
+Usage:
+  python benchmarks/synthetic.py csv --rows 1000000 --output patients.csv
+  python benchmarks/synthetic.py history --users 100 --per-user 10000 --db bench.db
+
+``csv`` writes a /predict_csv upload (feature columns plus Name). The rows
+are resampled from diabetes.csv with a little noise, so they look like real
+patients but are not copies. ``history`` creates users that all have the
+password ``benchmark`` and gives each one a long prediction history.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+import db  # noqa: E402
+from features import FEATURE_COLUMNS  # noqa: E402
+INTEGER_COLUMNS = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'Age']
+BENCHMARK_PASSWORD = 'benchmark'
+PREDICTIONS = ('Not Diabetic', 'Borderline Risk', 'Diabetic')
+
+
+def load_source():
+    return pd.read_csv(os.path.join(BACKEND_DIR, 'diabetes.csv'))
+
+
+def make_patients(rows, seed=42, source=None):
+    """A DataFrame of ``rows`` synthetic patients with the /predict_csv columns."""
+    source = load_source() if source is None else source
+    rng = np.random.default_rng(seed)
+    sample = source[FEATURE_COLUMNS].sample(rows, replace=True, random_state=seed).reset_index(drop=True)
+    # Jitter by a few percent of each column's spread, keeping zeros (missing values) as they are
+    noise = rng.normal(0, 0.03, size=sample.shape) * sample.std().to_numpy()
+    jittered = (sample + noise).clip(lower=0).where(sample != 0, 0)
+    jittered[INTEGER_COLUMNS] = jittered[INTEGER_COLUMNS].round().astype(np.int64)
+    jittered['BMI'] = jittered['BMI'].round(1)
+    jittered['DiabetesPedigreeFunction'] = jittered['DiabetesPedigreeFunction'].round(3)
+    jittered.insert(0, 'Name', [f"patient-{i}" for i in range(rows)])
+    return jittered
+
+
+def write_patients_csv(path, rows, seed=42, chunk_size=100000):
+    """Write ``rows`` synthetic patients to ``path`` a chunk at a time."""
+    source = load_source()
+    for start in range(0, rows, chunk_size):
+        chunk = make_patients(min(chunk_size, rows - start), seed=seed + start, source=source)
+        chunk['Name'] = [f"patient-{i}" for i in range(start, start + len(chunk))]
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return path
+
+
+def seed_history(path, users, per_user, seed=42, batch=50000):
+    """Create ``users`` users (user-0, user-1, ...) with ``per_user`` predictions each.
+
+    Returns the usernames. Timestamps are one minute apart going back from
+    now, so the keyset pages walk real ranges.
+    """
+    from passlib.hash import pbkdf2_sha256
+
+    db.init_db(path)
+    # One real hash shared by everyone keeps seeding fast while /login still verifies
+    hashed = pbkdf2_sha256.hash(BENCHMARK_PASSWORD)
+    source = load_source()
+    rng = np.random.default_rng(seed)
+    conn = db.connect(path)
+    try:
+        usernames = [f"user-{i}" for i in range(users)]
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                             [(name, hashed) for name in usernames])
+        ids = [conn.execute("SELECT id FROM users WHERE username = ?", (name,)).fetchone()[0] for name in usernames]
+        now = time.time()
+        for user_id in ids:
+            for start in range(0, per_user, batch):
+                n = min(batch, per_user - start)
+                sample = source.sample(n, replace=True, random_state=int(rng.integers(1 << 31)))
+                risk = rng.uniform(0, 100, n)
+                labels = np.array(PREDICTIONS)[np.digitize(risk, [40, 60])]
+                stamps = pd.to_datetime(now - 60 * np.arange(start, start + n), unit='s').strftime('%Y-%m-%d %H:%M:%S')
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO predictions (user_id, prediction, glucose, blood_pressure, risk_percentage, "
+                        "diet_suggestion, sex, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        zip([user_id] * n, labels.tolist(), sample['Glucose'].astype(float).tolist(),
+                            sample['BloodPressure'].astype(float).tolist(), risk.tolist(),
+                            ['Synthetic diet suggestion'] * n, rng.choice(['male', 'female'], n).tolist(),
+                            stamps.tolist())
+                    )
+        return usernames
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    csv_parser = commands.add_parser('csv', help='write a large /predict_csv upload')
+    csv_parser.add_argument('--rows', type=int, default=100000)
+    csv_parser.add_argument('--output', default='patients.csv')
+    csv_parser.add_argument('--seed', type=int, default=42)
+    history_parser = commands.add_parser('history', help='create users with long prediction histories')
+    history_parser.add_argument('--users', type=int, default=10)
+    history_parser.add_argument('--per-user', type=int, default=10000)
+    history_parser.add_argument('--db', default='bench.db')
+    history_parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'csv':
+        write_patients_csv(args.output, args.rows, seed=args.seed)
+        print(f"Wrote {args.rows} patients to {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+    else:
+        seed_history(args.db, args.users, args.per_user, seed=args.seed)
+        print(f"Seeded {args.users} users x {args.per_user} predictions into {args.db} "
+              f"(password '{BENCHMARK_PASSWORD}')")
+    print(f"took {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
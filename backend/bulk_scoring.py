@@ -0,0 +1,451 @@
+import codecs
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import db
+from features import FEATURE_COLUMNS
+
+CSV_REQUIRED_COLUMNS = FEATURE_COLUMNS + ['Name']
+
+log = logging.getLogger('diabetes_app.bulk_scoring')
+
+INPUT_FILE = 'input.csv'
+PLAN_FILE = 'plan.json'
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+# Shards smaller than this are not worth a round trip to a worker process
+MIN_SHARD_BYTES = 64 * 1024
+# A job whose shards keep killing pool workers is failed after this many retries
+MAX_POOL_FAILURES = 3
+
+
+def label_csv_predictions(active, probs):
+    """Vectorized Diabetic / Borderline Risk / Non-Diabetic labels from predict_proba output."""
+    preds = active.predictor.classes_.take(np.argmax(probs, axis=1))
+    return np.where(preds == 1, "Diabetic",
+                    np.where(probs[:, 1] > 0.35, "Borderline Risk", "Non-Diabetic"))
+
+
+class ScoringJobsBusy(Exception):
+    """Raised instead of queueing when too many jobs are already waiting."""
+
+
+# --- Worker process side -------------------------------------------------------
+
+_worker_model = None
+
+
+def _init_worker(niceness):
+    # Lower the scoring processes' priority so interactive requests win the CPU
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+
+
+def _load_model(root, legacy_model_path, version):
+    """The job's model version, loaded once per worker process."""
+    global _worker_model
+    from model_registry import ModelRegistry
+
+    if _worker_model is None or _worker_model.version != version:
+        registry = ModelRegistry(root, legacy_model_path)
+        if any(entry['version'] == version for entry in registry.versions()):
+            _worker_model = registry.load(version)
+        else:
+            loaded = registry.load_legacy()
+            if loaded is None or loaded.version != version:
+                raise RuntimeError(f"Model version {version} is no longer available")
+            _worker_model = loaded
+    return _worker_model
+
+
+def score_shard(model_spec, input_path, columns, start, end, part_path, chunk_size=10000):
+    """Score the rows in bytes [start, end) of the input and write them as NDJSON.
+
+    The part file is renamed into place only once complete, so a shard whose
+    part exists never has to be scored again. Returns the number of rows.
+    """
+    import pandas as pd
+
+    active = _load_model(*model_spec)
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    rows = 0
+    tmp_path = f"{part_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as out:
+        if data.strip():
+            for chunk in pd.read_csv(io.BytesIO(data), header=None, names=columns, chunksize=chunk_size):
+                if chunk.empty:
+                    continue
+                probs = active.predictor.predict_proba(chunk[FEATURE_COLUMNS])
+                labels = label_csv_predictions(active, probs)
+                for name, label, risk in zip(chunk['Name'].tolist(), labels.tolist(), (probs[:, 1] * 100).tolist()):
+                    out.write(json.dumps({'name': name, 'prediction': label, 'risk_percentage': risk}) + '\n')
+                rows += len(chunk)
+    os.replace(tmp_path, part_path)
+    return rows
+
+
+# --- Web process side ----------------------------------------------------------
+
+def plan_shards(path, shards):
+    """Split a CSV into up to ``shards`` byte ranges that start on line boundaries.
+
+    Returns (columns, ranges). Quoted fields must not contain newlines.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        shards = max(1, min(shards, (size - data_start) // MIN_SHARD_BYTES))
+        bounds = [data_start]
+        for i in range(1, shards):
+            f.seek(data_start + (size - data_start) * i // shards)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+    columns = next(csv.reader([codecs.decode(header, 'utf-8-sig')]), [])
+    return [column.strip() for column in columns], list(zip(bounds, bounds[1:]))
+
+
+class ScoringJobs:
+    """Background scoring of uploaded CSV files.
+
+    ``submit`` stores the upload under ``<jobs_dir>/<job_id>/``, splits it
+    into line-aligned shards and records the job in the ``scoring_jobs``
+    table. A runner thread, started by ``start()`` in each process that
+    serves requests, claims queued jobs and scores their shards on a
+    process pool, writing one NDJSON part file per shard; job state lives in
+    SQLite and finished parts on disk, so after a restart an unfinished job
+    is picked up again and only its missing shards are scored.
+
+    To leave CPU for /predict, the pool has ``workers`` processes running at
+    a lowered priority, at most ``max_running`` jobs run at once across all
+    processes sharing the database, and ``submit`` raises ScoringJobsBusy
+    once ``max_queued`` jobs are waiting. If a pool process dies, the pool
+    is replaced and the job goes back to the queue, up to
+    MAX_POOL_FAILURES times.
+
+    Uploads hold patient data, so finished and failed jobs are deleted,
+    files and row, ``retention_seconds`` after they end (never if None).
+    """
+
+    def __init__(self, jobs_dir, registry, workers=1, max_queued=20, max_running=1,
+                 shard_bytes=16 * 1024 * 1024, niceness=10, stale_seconds=60.0,
+                 poll_interval=1.0, chunk_size=10000, retention_seconds=24 * 3600,
+                 cleanup_interval=60.0):
+        self.jobs_dir = jobs_dir
+        self.registry = registry
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_running = max_running
+        self.shard_bytes = shard_bytes
+        self.niceness = niceness
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self.chunk_size = chunk_size
+        self.retention_seconds = retention_seconds
+        self.cleanup_interval = cleanup_interval
+        self._pool = None
+        self._pool_pid = None
+        self._closed = False
+        self._thread = None
+        self._runner_pid = None
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # A forked worker inherits the runner but not its thread; start() makes its own
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def start(self):
+        """Start the runner thread in this process unless it is already running.
+
+        Not done in __init__, so a ``gunicorn --preload`` master that only
+        builds the app never claims jobs itself; the app calls this on each
+        request, which only does work the first time in each worker.
+        """
+        if self._runner_pid == os.getpid() or self._closed:
+            return
+        with self._start_lock:
+            if self._runner_pid == os.getpid() or self._closed:
+                return
+            self._pool = None
+            self._wake = threading.Event()
+            self._stop = threading.Event()
+            self._owner = f"{socket.gethostname()}:{os.getpid()}"
+            self._thread = threading.Thread(target=self._run, name='scoring-jobs', daemon=True)
+            self._thread.start()
+            self._runner_pid = os.getpid()
+
+    def _reset_after_fork(self):
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pool = None
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def submit(self, upload, filename, model_version):
+        """Store an uploaded CSV (a werkzeug FileStorage) and queue it; returns the job id."""
+        self.start()
+        with db.get_connection() as conn:
+            queued = conn.execute("SELECT COUNT(*) FROM scoring_jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= self.max_queued:
+            raise ScoringJobsBusy("Too many scoring jobs waiting")
+
+        job_id = uuid.uuid4().hex
+        path = self.job_dir(job_id)
+        os.makedirs(path)
+        try:
+            input_path = os.path.join(path, INPUT_FILE)
+            upload.save(input_path)
+            shards = max(self.workers, -(-os.path.getsize(input_path) // self.shard_bytes))
+            columns, ranges = plan_shards(input_path, shards)
+            if not all(column in columns for column in CSV_REQUIRED_COLUMNS):
+                raise ValueError("Missing required columns")
+            with open(os.path.join(path, PLAN_FILE), 'w') as f:
+                json.dump({'columns': columns, 'shards': ranges}, f)
+            with db.get_connection() as conn:
+                conn.execute(
+                    "INSERT INTO scoring_jobs (id, status, filename, model_version, shards_total, bytes_total) "
+                    "VALUES (?, 'queued', ?, ?, ?, ?)",
+                    (job_id, filename, model_version, len(ranges), sum(end - start for start, end in ranges))
+                )
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id):
+        """Job state as a dict, or None for an unknown id."""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        with db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT id, status, filename, model_version, shards_total, shards_done, rows_scored, "
+                "bytes_total, bytes_done, error, created_at, started_at, finished_at "
+                "FROM scoring_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'status': row[1],
+            'filename': row[2],
+            'model_version': row[3],
+            'shards_total': row[4],
+            'shards_done': row[5],
+            'rows_scored': row[6],
+            'progress': row[8] / row[7] if row[7] else (1.0 if row[1] == 'done' else 0.0),
+            'error': row[9],
+            'created_at': row[10],
+            'started_at': row[11],
+            'finished_at': row[12],
+        }
+
+    def result_paths(self, job_id):
+        """Part files of a finished job, in input order."""
+        with open(os.path.join(self.job_dir(job_id), PLAN_FILE)) as f:
+            plan = json.load(f)
+        return [self._part_path(job_id, index) for index in range(len(plan['shards']))]
+
+    def close(self, timeout=5.0):
+        """Stop the runner; a job in progress is handed back to the queue."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._runner_pid == os.getpid():
+            self._thread.join(timeout)
+        self._discard_pool()
+
+    def _part_path(self, job_id, index):
+        return os.path.join(self.job_dir(job_id), f"part-{index:05d}.ndjson")
+
+    def _get_pool(self):
+        # Each process gets its own pool; spawned children re-import __main__,
+        # so scripts need a __main__ guard
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.niceness,),
+            )
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def _discard_pool(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    def _run(self):
+        conn = db.connect()
+        next_cleanup = 0.0
+        try:
+            while not self._stop.is_set():
+                if self.retention_seconds and time.monotonic() >= next_cleanup:
+                    next_cleanup = time.monotonic() + self.cleanup_interval
+                    try:
+                        self._expire(conn)
+                    except Exception:
+                        log.exception("Could not delete expired scoring jobs")
+                try:
+                    job = self._claim(conn)
+                except Exception:
+                    log.exception("Scoring job runner could not claim a job")
+                    job = None
+                if job is None:
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+                    continue
+                try:
+                    self._process(conn, *job)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed); the pool refuses all work from now on
+                    log.warning("Scoring pool broke; requeueing job", extra={'job_id': job[0]})
+                    self._discard_pool()
+                    self._pool_broke(conn, job[0])
+                except Exception as e:
+                    log.exception("Scoring job failed", extra={'job_id': job[0]})
+                    self._finish(conn, job[0], 'failed', str(e))
+        finally:
+            conn.close()
+
+    def _claim(self, conn):
+        """Atomically take the oldest queued (or abandoned) job; returns (id, model_version) or None."""
+        now = time.time()
+        stale = now - self.stale_seconds
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute(
+                "SELECT COUNT(*) FROM scoring_jobs WHERE status = 'running' AND heartbeat >= ?", (stale,)
+            ).fetchone()[0]
+            if running >= self.max_running:
+                return None
+            # A running job whose heartbeat stopped belonged to a process that died
+            job = conn.execute(
+                "SELECT id, model_version FROM scoring_jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) "
+                "ORDER BY created_at, rowid LIMIT 1", (stale,)
+            ).fetchone()
+            if job is None:
+                return None
+            conn.execute(
+                "UPDATE scoring_jobs SET status = 'running', owner = ?, heartbeat = ?, "
+                "started_at = COALESCE(started_at, CURRENT_TIMESTAMP) WHERE id = ?",
+                (self._owner, now, job[0])
+            )
+        return job
+
+    def _process(self, conn, job_id, model_version):
+        input_path = os.path.join(self.job_dir(job_id), INPUT_FILE)
+        with open(os.path.join(self.job_dir(job_id), PLAN_FILE)) as f:
+            plan = json.load(f)
+
+        # Shards finished before a restart are kept
+        shards_done, rows, bytes_done, todo = 0, 0, 0, []
+        for index, (start, end) in enumerate(plan['shards']):
+            part_path = self._part_path(job_id, index)
+            if os.path.exists(part_path):
+                with open(part_path) as part:
+                    rows += sum(1 for _ in part)
+                shards_done += 1
+                bytes_done += end - start
+            else:
+                todo.append((index, start, end))
+        if not self._progress(conn, job_id, shards_done, rows, bytes_done):
+            return
+
+        model_spec = (self.registry.root, self.registry.legacy_model_path, model_version)
+        pool = self._get_pool()
+        futures = {
+            pool.submit(score_shard, model_spec, input_path, plan['columns'], start, end,
+                        self._part_path(job_id, index), self.chunk_size): end - start
+            for index, start, end in todo
+        }
+        try:
+            while futures:
+                finished, _ = wait(futures, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                if self._stop.is_set():
+                    self._requeue(conn, job_id)
+                    return
+                for future in finished:
+                    size = futures.pop(future)
+                    rows += future.result()
+                    shards_done += 1
+                    bytes_done += size
+                if not self._progress(conn, job_id, shards_done, rows, bytes_done):
+                    return
+        finally:
+            for future in futures:
+                future.cancel()
+        self._finish(conn, job_id, 'done')
+
+    def _progress(self, conn, job_id, shards_done, rows, bytes_done):
+        """Record progress and heartbeat; False if another process has taken the job over."""
+        with conn:
+            updated = conn.execute(
+                "UPDATE scoring_jobs SET shards_done = ?, rows_scored = ?, bytes_done = ?, heartbeat = ? "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (shards_done, rows, bytes_done, time.time(), job_id, self._owner)
+            ).rowcount
+        return updated == 1
+
+    def _requeue(self, conn, job_id):
+        with conn:
+            conn.execute("UPDATE scoring_jobs SET status = 'queued', owner = NULL WHERE id = ? AND owner = ?",
+                         (job_id, self._owner))
+
+    def _expire(self, conn):
+        """Delete jobs that finished more than retention_seconds ago, with their files."""
+        with conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM scoring_jobs WHERE status IN ('done', 'failed') "
+                "AND finished_at < datetime('now', ?)", (f"-{int(self.retention_seconds)} seconds",)
+            )]
+            conn.executemany("DELETE FROM scoring_jobs WHERE id = ?", [(job_id,) for job_id in expired])
+        for job_id in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        if expired:
+            log.info("Deleted expired scoring jobs", extra={'jobs': len(expired)})
+
+    def _pool_broke(self, conn, job_id):
+        """Requeue a job whose pool broke; its finished shards are kept."""
+        with conn:
+            updated = conn.execute(
+                "UPDATE scoring_jobs SET pool_failures = pool_failures + 1 WHERE id = ? AND owner = ?",
+                (job_id, self._owner)
+            ).rowcount
+            failures = conn.execute("SELECT pool_failures FROM scoring_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if not updated:
+            return
+        if failures >= MAX_POOL_FAILURES:
+            self._finish(conn, job_id, 'failed', "Scoring worker process died repeatedly")
+        else:
+            self._requeue(conn, job_id)
+
+    def _finish(self, conn, job_id, status, error=None):
+        with conn:
+            conn.execute(
+                "UPDATE scoring_jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP "
+                "WHERE id = ? AND owner = ?", (status, error, job_id, self._owner)
+            )
@@ -0,0 +1,303 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from instrumentation import DB_LATENCY, PREDICTIONS_WRITTEN
+
+# Define the absolute path to users.db
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DATABASE_PATH = os.environ.get('DATABASE_PATH', os.path.join(BASE_DIR, 'users.db'))
+
+# Applied to every connection. WAL lets readers run alongside the writer and
+# synchronous=NORMAL is durable across application crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+PREDICTION_INSERT = (
+    "INSERT INTO predictions (user_id, prediction, glucose, blood_pressure, risk_percentage, diet_suggestion, sex) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def add_column(table, column, definition):
+    """Migration step adding ``column`` to ``table`` unless it is already there.
+
+    SQLite has no ADD COLUMN IF NOT EXISTS, and a database whose
+    user_version lags its schema (restored from a backup, or migrated by an
+    older release whose ALTER committed before its version bump) would
+    otherwise fail every boot with "duplicate column name".
+    """
+    def migrate(conn):
+        if column not in [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return migrate
+
+
+# Schema changes applied in order by init_db: SQL statements, or callables
+# taking the connection. PRAGMA user_version records how many have run, so
+# append new entries and never edit old ones. Every entry must be safe to
+# run against a schema that already has its change.
+MIGRATIONS = (
+    # Serves /history's per-user, newest-first keyset pagination
+    "CREATE INDEX IF NOT EXISTS idx_predictions_user_timestamp ON predictions (user_id, timestamp, id)",
+    # Background /predict_csv jobs (bulk_scoring.py); heartbeat is a Unix time
+    # refreshed by the process scoring the job
+    """CREATE TABLE IF NOT EXISTS scoring_jobs
+       (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, model_version TEXT,
+        shards_total INTEGER, shards_done INTEGER DEFAULT 0, rows_scored INTEGER DEFAULT 0,
+        bytes_total INTEGER, bytes_done INTEGER DEFAULT 0, error TEXT, owner TEXT, heartbeat REAL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP, started_at DATETIME, finished_at DATETIME)""",
+    # Times a job was requeued because a scoring worker process died
+    add_column('scoring_jobs', 'pool_failures', "INTEGER NOT NULL DEFAULT 0"),
+)
+
+_local = threading.local()
+
+log = logging.getLogger('diabetes_app.db')
+
+
+def connect(path=None, isolation_level=''):
+    """Open a new connection with the tuned pragmas applied."""
+    conn = sqlite3.connect(path or DATABASE_PATH, timeout=30, isolation_level=isolation_level)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection():
+    """Return this thread's pooled connection, opening it on first use.
+
+    Use it as ``with get_connection() as conn:`` to commit or roll back a
+    transaction; the connection itself stays open for the next request.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+
+def init_db(path=None):
+    """Create the tables and apply pending migrations (to ``path`` instead of DATABASE_PATH if given).
+
+    Every worker runs this at startup. Python's sqlite3 does not open a
+    transaction for DDL or PRAGMA statements, so the connection is in
+    autocommit mode and the whole check-and-migrate runs inside one
+    BEGIN IMMEDIATE: the first worker applies the pending migrations while
+    the others wait for the write lock and then find nothing left to do.
+    """
+    conn = connect(path, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute('''CREATE TABLE IF NOT EXISTS users
+                            (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS predictions
+                            (id INTEGER PRIMARY KEY, user_id INTEGER, prediction TEXT,
+                             glucose REAL, blood_pressure REAL, risk_percentage REAL,
+                             diet_suggestion TEXT, sex TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                             FOREIGN KEY(user_id) REFERENCES users(id))''')
+
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                if callable(migration):
+                    migration(conn)
+                else:
+                    conn.execute(migration)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+class PredictionWriter:
+    """Write-behind queue that commits prediction rows in grouped transactions.
+
+    Request threads call ``submit`` and return immediately; a background
+    thread drains the queue every ``flush_interval`` seconds (or as soon as
+    ``batch_size`` rows are waiting) and inserts them with one executemany.
+    Anything still queued is written by ``close``, which runs at exit. At
+    most ``max_pending`` rows wait in the queue; ``submit`` raises
+    ``queue.Full`` beyond that rather than buffering without limit.
+    """
+
+    def __init__(self, path=None, batch_size=256, flush_interval=0.05, max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def alive(self):
+        """Whether the writer thread is still draining the queue."""
+        return not self._closed and self._thread.is_alive()
+
+    def submit(self, row):
+        """Queue one ``PREDICTION_INSERT`` parameter tuple."""
+        if not self.alive:
+            raise RuntimeError("PredictionWriter is not running")
+        self._queue.put_nowait(row)
+
+    def flush(self, timeout=5.0):
+        """Wait until every row submitted so far has been committed.
+
+        Returns False if that did not happen within ``timeout`` seconds or
+        the writer is not running.
+        """
+        if not self.alive:
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def take_pending(self):
+        """Remove and return the rows still queued, for a replacement writer."""
+        waiters = []
+        rows = self._drain(waiters)
+        for waiter in waiters:
+            waiter.set()
+        return rows
+
+    def close(self, timeout=10.0):
+        """Write out the remaining rows and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            log.error("Prediction writer did not drain its queue before closing")
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            conn = connect(self.path)
+        except Exception:
+            log.exception("Prediction writer could not connect to the database")
+            return
+        try:
+            stop = False
+            while not stop:
+                rows, waiters, stop = self._collect()
+                self._write(conn, rows)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """Gather rows for one transaction; returns (rows, flush waiters, stop)."""
+        rows, waiters = [], []
+        item = self._queue.get()
+        # Keep collecting for one flush interval so bursts share a transaction
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is None:
+                rows.extend(self._drain(waiters))
+                return rows, waiters, True
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                rows.append(item)
+            remaining = deadline - time.monotonic()
+            if waiters or len(rows) >= self.batch_size or remaining <= 0:
+                return rows, waiters, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return rows, waiters, False
+
+    def _drain(self, waiters):
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                rows.append(item)
+
+    def _write(self, conn, rows):
+        if not rows:
+            return
+        try:
+            with DB_LATENCY.time(operation='prediction_insert_batch'), conn:
+                conn.executemany(PREDICTION_INSERT, rows)
+            self.written += len(rows)
+            PREDICTIONS_WRITTEN.inc(len(rows), outcome='written')
+        except Exception:
+            self.failed += len(rows)
+            PREDICTIONS_WRITTEN.inc(len(rows), outcome='failed')
+            log.exception("Error saving predictions to database", extra={'rows': len(rows)})
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # SQLite connections and threads must not cross a fork; a preloaded
+    # master's pool and writer are replaced by fresh ones in each worker
+    global _local, _writer, _writer_lock
+    _local = threading.local()
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_prediction_writer():
+    """Return the process-wide PredictionWriter, starting it on first use.
+
+    A writer whose thread has died or been closed is replaced, and the rows
+    it still had queued are handed to the new one.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.alive:
+            pending = []
+            if _writer is not None:
+                log.warning("Prediction writer stopped; starting a new one")
+                pending = _writer.take_pending()
+            _writer = PredictionWriter()
+            for count, row in enumerate(pending):
+                try:
+                    _writer.submit(row)
+                except queue.Full:
+                    log.error("Dropped queued predictions", extra={'rows': len(pending) - count})
+                    break
+        return _writer
+
+
+def close_prediction_writer():
+    """Write out queued predictions; registered to run at exit."""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.close()
+
+
+atexit.register(close_prediction_writer)
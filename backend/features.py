@@ -0,0 +1,12 @@
+"""The model's input schema, shared by training, the API and the CSV scorers.
+
+Kept free of heavy imports so app.py can use it without loading
+scikit-learn; preprocessing.py re-exports it for the training side.
+"""
+
+# Column order the model was trained on; every feature row follows it
+FEATURE_COLUMNS = [
+    'Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
+    'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age'
+]
+TARGET_COLUMN = 'Outcome'
@@ -0,0 +1,211 @@
+import numpy as np
+
+
+class CompiledForest:
+    """Array-backed inference engine for a fitted sklearn RandomForestClassifier.
+
+    Every tree of the forest is flattened into one set of contiguous node
+    arrays at load time, so scoring a row is a handful of vectorized NumPy
+    steps instead of sklearn's input validation and per-tree dispatch.
+    Leaves point back at themselves, which lets all rows and trees walk
+    down together until every one of them has reached a leaf.
+
+    The per-call overhead this removes dominates small inputs only; batches
+    larger than ``native_batch_rows`` are handed back to the forest's own
+    Cython traversal, which is faster once that overhead is amortised.
+    Pass ``native_batch_rows=None`` to always use the array traversal.
+
+    Missing values (NaN) follow each split's ``missing_go_to_left`` branch,
+    as sklearn's trees do; infinite values are rejected like sklearn rejects
+    them.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right, value,
+                 roots, max_depth, classes, n_features, missing_go_to_left, forest=None,
+                 native_batch_rows=512, block_size=4096):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.missing_go_to_left = missing_go_to_left
+        self.value = value
+        self.is_leaf = children_left == np.arange(children_left.shape[0])
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.forest = forest
+        self.native_batch_rows = native_batch_rows
+        self.block_size = block_size
+
+    @classmethod
+    def from_sklearn(cls, forest, native_batch_rows=512, block_size=4096):
+        """Flatten a fitted RandomForestClassifier into contiguous arrays."""
+        estimators = getattr(forest, 'estimators_', None)
+        if not estimators or not hasattr(estimators[0], 'tree_'):
+            raise ValueError(f"Cannot compile {type(forest).__name__}: expected a fitted tree ensemble.")
+        if getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled.")
+
+        n_classes = len(forest.classes_)
+        features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so extra traversal steps are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+            # Trees from sklearn < 1.3 have no missing-value routing (nor accept NaN)
+            missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            missing_lefts.append(missing_left)
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children_left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            children_right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            missing_go_to_left=np.ascontiguousarray(np.concatenate(missing_lefts), dtype=bool),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(forest.classes_),
+            n_features=forest.n_features_in_,
+            forest=forest,
+            native_batch_rows=native_batch_rows,
+            block_size=block_size,
+        )
+
+    ARRAYS = ('feature', 'threshold', 'children_left', 'children_right', 'missing_go_to_left',
+              'value', 'roots', 'classes_')
+
+    def save(self, path):
+        """Write the node arrays uncompressed so ``load`` can memory-map them."""
+        import joblib
+
+        state = {name: getattr(self, name) for name in self.ARRAYS}
+        state.update(max_depth=self.max_depth, n_features=self.n_features_in_)
+        joblib.dump(state, path)
+
+    @classmethod
+    def load(cls, path, forest=None, mmap_mode='r', **kwargs):
+        """Load arrays written by ``save``; with mmap_mode='r' every process
+        mapping the same file shares its pages instead of holding a copy.
+
+        Raises KeyError for files written before ``missing_go_to_left`` was
+        stored, so callers can recompile them."""
+        import joblib
+
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        return cls(
+            feature=state['feature'],
+            threshold=state['threshold'],
+            children_left=state['children_left'],
+            children_right=state['children_right'],
+            missing_go_to_left=state['missing_go_to_left'],
+            value=state['value'],
+            roots=state['roots'],
+            max_depth=state['max_depth'],
+            classes=state['classes_'],
+            n_features=state['n_features'],
+            forest=forest,
+            **kwargs
+        )
+
+    def apply(self, X):
+        """Return the flattened leaf index reached by every row in every tree."""
+        # sklearn evaluates splits on float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}.")
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity or a value too large for dtype('float32').")
+        has_missing = np.isnan(X).any()
+
+        n_rows, n_trees = X.shape[0], self.roots.shape[0]
+        X_flat = X.ravel()
+        nodes = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+
+        # Only (row, tree) pairs still sitting on a split node take another step
+        active = np.arange(nodes.shape[0])
+        for _ in range(self.max_depth):
+            current = nodes[active]
+            values = X_flat[row_start[active] + self.feature[current]]
+            go_left = values <= self.threshold[current]
+            if has_missing:
+                go_left |= np.isnan(values) & self.missing_go_to_left[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+            if not active.shape[0]:
+                break
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        """Class probabilities matching ``RandomForestClassifier.predict_proba``."""
+        if (self.forest is not None and self.native_batch_rows is not None
+                and len(X) > self.native_batch_rows):
+            return self.forest.predict_proba(X)
+
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[0] <= self.block_size:
+            return self.value[self.apply(X)].mean(axis=1)
+
+        # Walk large batches in blocks to keep the (rows x trees) index arrays small
+        return np.concatenate([
+            self.value[self.apply(X[start:start + self.block_size])].mean(axis=1)
+            for start in range(0, X.shape[0], self.block_size)
+        ])
+
+    def predict(self, X):
+        """Predicted class labels, as ``RandomForestClassifier.predict``."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+class CompiledPipeline:
+    """A fitted sklearn Pipeline whose final forest is served by a CompiledForest.
+
+    The preprocessing steps run first, on a float64 array so they never see
+    DataFrame column names, and their output goes to ``forest``.
+    """
+
+    def __init__(self, steps, forest):
+        self.steps = steps
+        self.forest = forest
+        self.classes_ = forest.classes_
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        for step in self.steps:
+            X = step.transform(X)
+        return X
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(self.transform(X))
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
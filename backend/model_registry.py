@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from forest_engine import CompiledForest, CompiledPipeline
+
+MODEL_FILE = 'model.pkl'
+COMPILED_FILE = 'compiled.joblib'
+METRICS_FILE = 'metrics.json'
+ACTIVE_FILE = 'ACTIVE'
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+log = logging.getLogger('diabetes_app.model_registry')
+
+SAMPLE_INPUT = np.array([[2, 120, 70, 20, 85, 32.5, 0.5, 25]])
+
+
+class ActiveModel:
+    """One loaded model version. Never mutated, so a request that grabbed it
+    keeps a consistent model, predictor and version even across a swap."""
+
+    def __init__(self, version, model, predictor, metrics, path):
+        self.version = version
+        self.model = model
+        self.predictor = predictor
+        self.metrics = metrics
+        self.path = path
+        self.loaded_at = time.time()
+
+    @property
+    def accuracy(self):
+        """Accuracy as a percentage, or None if the artifact did not record one."""
+        accuracy = self.metrics.get('accuracy')
+        return None if accuracy is None else float(accuracy) * 100
+
+
+class ModelRegistry:
+    """Versioned model artifacts with atomic hot swapping.
+
+    Each version lives in ``<root>/<version>/`` as ``model.pkl`` plus an
+    optional ``metrics.json``; ``<root>/ACTIVE`` names the version every
+    worker should serve. The compiled forest arrays are cached next to the
+    artifact (for the legacy model, in ``<root>/.legacy-<hash>.joblib``) and
+    memory-mapped, so forked workers and separate processes share those
+    pages. The sklearn model itself is not shared: unpickling a tree copies
+    its nodes into private memory, so every worker holds its own copy, kept
+    for the native traversal of large batches. Registering a version never
+    serves it by itself; until a version is activated, the legacy
+    ``rmodel.pkl`` / ``model_accuracy.txt`` pair is served instead.
+    """
+
+    def __init__(self, root, legacy_model_path=None, legacy_accuracy_path=None, mmap_mode='r'):
+        self.root = root
+        self.legacy_model_path = legacy_model_path
+        self.legacy_accuracy_path = legacy_accuracy_path
+        self.mmap_mode = mmap_mode
+        self._active = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watch_interval = None
+        self._stop = threading.Event()
+
+    @property
+    def active(self):
+        """The model currently being served (None if nothing is loaded)."""
+        return self._active
+
+    def versions(self):
+        """Registered versions with their metrics, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if VERSION_PATTERN.match(name) and os.path.isfile(os.path.join(path, MODEL_FILE)):
+                versions.append({
+                    'version': name,
+                    'metrics': self._read_metrics(path),
+                    'created': os.path.getmtime(os.path.join(path, MODEL_FILE)),
+                    'active': self._active is not None and self._active.version == name,
+                })
+        return sorted(versions, key=lambda entry: entry['created'])
+
+    def active_version_on_disk(self):
+        """Version named by the ACTIVE file, or None if nothing has been activated."""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def register(self, version, model, metrics=None, activate=False):
+        """Store a fitted model as a new version, optionally making it active."""
+        import joblib
+
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid model version: {version!r}")
+        path = os.path.join(self.root, version)
+        if os.path.exists(path):
+            raise ValueError(f"Model version {version} already exists")
+        # Write into a temporary directory and rename, so watchers never see half an artifact
+        staging = os.path.join(self.root, f".{version}.tmp")
+        os.makedirs(staging)
+        joblib.dump(model, os.path.join(staging, MODEL_FILE))
+        with open(os.path.join(staging, METRICS_FILE), 'w') as f:
+            json.dump(metrics or {}, f, indent=2)
+        os.replace(staging, path)
+        if activate:
+            self.activate(version)
+        return path
+
+    def load(self, version):
+        """Load one version and warm it up, without activating it."""
+        import joblib
+
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid model version: {version!r}")
+        path = os.path.join(self.root, version)
+        model_path = os.path.join(path, MODEL_FILE)
+        if not os.path.isfile(model_path):
+            raise ValueError(f"Unknown model version: {version}")
+        model = joblib.load(model_path, mmap_mode=self.mmap_mode)
+        predictor = self._compile(model, os.path.join(path, COMPILED_FILE))
+        predictor.predict_proba(SAMPLE_INPUT)
+        return ActiveModel(version, model, predictor, self._read_metrics(path), model_path)
+
+    def load_legacy(self):
+        """Load the pre-registry rmodel.pkl, versioned by its content hash."""
+        import joblib
+
+        if not self.legacy_model_path or not os.path.exists(self.legacy_model_path):
+            return None
+        with open(self.legacy_model_path, 'rb') as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        model = joblib.load(self.legacy_model_path, mmap_mode=self.mmap_mode)
+        # Keyed by content hash, so replacing rmodel.pkl never reuses stale arrays
+        predictor = self._compile(model, os.path.join(self.root, f".legacy-{version}.joblib"))
+        predictor.predict_proba(SAMPLE_INPUT)
+        metrics = {}
+        try:
+            with open(self.legacy_accuracy_path, 'r') as f:
+                metrics['accuracy'] = float(f.read())
+        except (TypeError, FileNotFoundError, ValueError):
+            pass
+        return ActiveModel(version, model, predictor, metrics, self.legacy_model_path)
+
+    def activate(self, version, persist=True):
+        """Load ``version`` and atomically make it the active model.
+
+        In-flight requests finish on the model they started with; only
+        requests arriving after the swap see the new one. With ``persist``
+        the ACTIVE file is rewritten so other workers follow via the watcher.
+        """
+        loaded = self.load(version)
+        with self._lock:
+            self._active = loaded
+            if persist:
+                self._write_active(version)
+        log.info("Model version activated", extra={'model_version': version})
+        return loaded
+
+    def load_active(self):
+        """Load whatever should be served at startup: the version named by ACTIVE or the legacy model."""
+        version = self.active_version_on_disk()
+        if version:
+            return self.activate(version, persist=False)
+        loaded = self.load_legacy()
+        with self._lock:
+            self._active = loaded
+        return loaded
+
+    def start_watcher(self, interval=5.0):
+        """Poll the ACTIVE file and hot-swap when another process changes it."""
+        if self._watcher is not None or interval <= 0:
+            return
+        if self._watch_interval is None:
+            # A forked worker inherits the flag but not the thread, so start its own
+            os.register_at_fork(after_in_child=self._restart_watcher)
+        self._watch_interval = interval
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def _restart_watcher(self):
+        self._watcher = None
+        self._lock = threading.Lock()
+        if not self._stop.is_set():
+            self.start_watcher(self._watch_interval)
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self, interval):
+        # Only an ACTIVE file triggers a swap; without one the current model keeps serving
+        while not self._stop.wait(interval):
+            try:
+                version = self.active_version_on_disk()
+                active = self._active
+                if version and (active is None or active.version != version):
+                    self.activate(version, persist=False)
+            except Exception:
+                log.exception("Model watcher could not activate new version")
+
+    def _compile(self, model, compiled_path):
+        """Array-backed predictor for forests, shared via mmap when cached; other models are used as-is.
+
+        For a Pipeline (as written by train.py) the final forest is compiled
+        and the preprocessing steps are applied in front of it.
+        """
+        steps = getattr(model, 'steps', None)
+        forest = steps[-1][1] if steps else model
+        try:
+            compiled = None
+            if compiled_path and os.path.exists(compiled_path):
+                try:
+                    compiled = CompiledForest.load(compiled_path, forest=forest, mmap_mode=self.mmap_mode)
+                except KeyError:
+                    log.info("Recompiling outdated forest cache", extra={'path': compiled_path})
+            if compiled is None:
+                compiled = CompiledForest.from_sklearn(forest)
+                if compiled_path:
+                    compiled = self._cache_compiled(compiled, compiled_path, forest)
+        except ValueError as e:
+            log.info("Using sklearn inference", extra={'reason': str(e)})
+            return model
+        if steps:
+            return CompiledPipeline([step for _, step in steps[:-1]], compiled)
+        return compiled
+
+    def _cache_compiled(self, compiled, compiled_path, forest):
+        """Write ``compiled`` to ``compiled_path`` and map it back; in-memory arrays if the cache is not writable."""
+        tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+            compiled.save(tmp_path)
+            os.replace(tmp_path, compiled_path)
+        except OSError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            log.warning("Could not cache compiled forest", extra={'path': compiled_path, 'error': str(e)})
+            return compiled
+        return CompiledForest.load(compiled_path, forest=forest, mmap_mode=self.mmap_mode)
+
+    def _write_active(self, version):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".{ACTIVE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    @staticmethod
+    def _read_metrics(path):
+        try:
+            with open(os.path.join(path, METRICS_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
@@ -1,7 +1,71 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import pandas as pd
+import numpy as np
+
+ACTIVITY_MULTIPLIERS = {
+    "low": 1.2,
+    "medium": 1.55,
+    "high": 1.9
+}
+
+
+def _round2(values):
+    """np.round(values, 2), corrected to agree exactly with Python's round() on near-ties."""
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return rounded
+
+
+def _to_float(values):
+    """Convert to a float64 array, mapping entries float() rejects to NaN."""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+def _factorize(values):
+    """Integer codes per row plus the distinct values they index.
+
+    Categorical columns hold a handful of distinct strings, so per-value
+    Python work (lower(), dict lookups) is done once per category and then
+    broadcast back to the rows with ``lookup[codes]``. Missing entries get
+    code -1, which indexes the extra trailing slot _lookup appends.
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    return codes, list(uniques)
+
+
+def _lookup(categories, fn, missing, dtype):
+    """Array of ``fn(category)`` per category, with ``missing`` as the trailing slot."""
+    return np.array([fn(value) for value in categories] + [missing], dtype=dtype)
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else None
+
+
+def _to_flags(values):
+    """Parse Diabetic values the way /recommend does ('true' in any case is True)."""
+    codes, categories = _factorize(values)
+    return _lookup(
+        categories,
+        lambda value: bool(value) if isinstance(value, (bool, np.bool_)) else str(value).lower() == 'true',
+        False, bool
+    )[codes]
+
 
 class DiabetesNutritionAdvisor:
     def __init__(self):
@@ -27,14 +91,9 @@ class DiabetesNutritionAdvisor:
         activity = activity.lower()
         if activity == 'moderate' or activity == 'medium':
             activity = 'medium'  # Map 'Moderate' or 'Medium' to 'medium'
-        activity_multipliers = {
-            "low": 1.2,
-            "medium": 1.55,
-            "high": 1.9
-        }
-        if activity not in activity_multipliers:
+        if activity not in ACTIVITY_MULTIPLIERS:
             raise ValueError(f"Invalid activity level: {activity}. Expected 'low', 'medium', 'moderate', or 'high'.")
-        TDEE = BMR * activity_multipliers[activity]
+        TDEE = BMR * ACTIVITY_MULTIPLIERS[activity]
         return round(TDEE, 2)
 
     def desired_nutrition(self, goal, TDEE, diabetic=False):
@@ -78,4 +137,109 @@ class DiabetesNutritionAdvisor:
             "bmi": bmi,
             "tdee": tdee,
             "nutrition": nutrition
-        }
\ No newline at end of file
+        }
+
+    def calculate_batch(self, age, height, weight, sex, activity_level, goal, diabetic=False):
+        """Vectorized get_nutrition_recommendations over arrays of users.
+
+        Returns a dict of float arrays (bmi, tdee, energy, carbs, protein, fat)
+        that match the scalar methods exactly, plus an ``errors`` object array
+        holding the message for each row that could not be computed (None
+        elsewhere). ``diabetic`` is a bool or an array of bools.
+        """
+        age = _to_float(age)
+        height = _to_float(height)
+        weight = _to_float(weight)
+        sex_codes, sexes = _factorize(sex)
+        activity_codes, activities = _factorize(activity_level)
+        goal_codes, goals = _factorize(goal)
+        sexes = [_lower(value) for value in sexes] + [None]
+        activities = [_lower(value) for value in activities] + [None]
+        goals = [_lower(value) for value in goals] + [None]
+        diabetic = np.broadcast_to(np.asarray(diabetic, dtype=bool), age.shape)
+
+        errors = np.full(age.shape, None, dtype=object)
+
+        def fail(mask, message):
+            errors[mask & (errors == None)] = message  # noqa: E711
+
+        for name, values in (('Age', age), ('Height', height), ('Weight', weight)):
+            fail(np.isnan(values), f"Invalid numeric value for {name}")
+        for name, codes, categories in (('Sex', sex_codes, sexes),
+                                        ('ActivityLevel', activity_codes, activities),
+                                        ('Goal', goal_codes, goals)):
+            fail(np.array([value is None for value in categories])[codes], f"Missing value for {name}")
+        fail(height == 0, "float division by zero")
+
+        activities = ['medium' if value == 'moderate' else value for value in activities]
+        for code, activity in enumerate(activities):
+            if activity is not None and activity not in ACTIVITY_MULTIPLIERS:
+                fail(activity_codes == code,
+                     f"Invalid activity level: {activity}. Expected 'low', 'medium', 'moderate', or 'high'.")
+        multiplier = np.array([ACTIVITY_MULTIPLIERS.get(value, np.nan) for value in activities])[activity_codes]
+        female = np.array([value == "female" for value in sexes])[sex_codes]
+        cutting = np.array([value == "cutting" for value in goals])[goal_codes]
+        bulking = np.array([value == "bulking" for value in goals])[goal_codes]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bmi = _round2(weight / (height ** 2))
+
+        # Same operand order as calculate_desire_TDEE so results are bit-identical
+        bmr = np.where(
+            female,
+            655 + (weight * 9.6) + (1.8 * height * 100) - (4.7 * age),
+            66 + (weight * 13.7) + (5 * height * 100) - (6.8 * age),
+        )
+        tdee = _round2(bmr * multiplier)
+
+        energy = np.where(cutting, tdee - 300, np.where(bulking, tdee + 400, tdee))
+        energy = np.where(diabetic, energy * 0.85, energy)
+        carbs = (energy * np.where(diabetic, 0.4, 0.5)) / 4
+        protein = (energy * np.where(diabetic, 0.3, 0.25)) / 4
+        fat = (energy * np.where(diabetic, 0.3, 0.25)) / 9
+
+        results = {
+            "bmi": bmi,
+            "tdee": tdee,
+            "energy": _round2(energy),
+            "carbs": _round2(carbs),
+            "protein": _round2(protein),
+            "fat": _round2(fat),
+        }
+        failed = errors != None  # noqa: E711
+        for values in results.values():
+            values[failed] = np.nan
+        results["errors"] = errors
+        return results
+
+    def get_nutrition_recommendations_batch(self, records):
+        """Batch counterpart of get_nutrition_recommendations.
+
+        ``records`` is a DataFrame (or a dict of equal-length sequences) using
+        the /recommend field names: Age, Height, Weight, Sex, ActivityLevel,
+        Goal and optionally Diabetic. Returns one entry per row, in order:
+        the dict get_nutrition_recommendations would return, or
+        ``{"error": message}``.
+        """
+        diabetic = _to_flags(records['Diabetic']) if 'Diabetic' in records else False
+        batch = self.calculate_batch(
+            records['Age'], records['Height'], records['Weight'], records['Sex'],
+            records['ActivityLevel'], records['Goal'], diabetic
+        )
+        columns = [batch[key].tolist() for key in ("bmi", "tdee", "energy", "carbs", "protein", "fat")]
+        recommendations = []
+        for error, bmi, tdee, energy, carbs, protein, fat in zip(batch["errors"], *columns):
+            if error is not None:
+                recommendations.append({"error": error})
+                continue
+            recommendations.append({
+                "bmi": bmi,
+                "tdee": tdee,
+                "nutrition": {
+                    "energy": energy,
+                    "carbs": carbs,
+                    "protein": protein,
+                    "fat": fat
+                }
+            })
+        return recommendations
@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.hash import pbkdf2_sha256
+
+log = logging.getLogger('diabetes_app.password_hashing')
+
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing when too many hashes are already pending."""
+
+
+def _handler(rounds):
+    if not rounds:
+        return pbkdf2_sha256
+    # Pinning min/max to the target makes needs_update() flag hashes made with
+    # any other rounds setting, whether it was raised or lowered
+    return pbkdf2_sha256.using(rounds=rounds, min_desired_rounds=rounds, max_desired_rounds=rounds)
+
+
+# Module-level so the pool can pickle them by reference
+def _hash(password, rounds):
+    return _handler(rounds).hash(password)
+
+
+def _verify(password, hashed):
+    return pbkdf2_sha256.verify(password, hashed)
+
+
+class PasswordHasher:
+    """PBKDF2 hashing and verification off the request threads.
+
+    PBKDF2 holds the GIL for its whole run, so hashing inline lets a burst of
+    logins starve every other request in the worker. Here the work runs in a
+    small process pool instead; at most ``max_pending`` calls may wait for it
+    and further calls fail fast with PasswordHasherBusy. ``workers=0`` hashes
+    inline, as before. A call still running after ``timeout`` seconds also
+    raises PasswordHasherBusy, and keeps its slot until the task finishes.
+    If a pool process dies, the pool is replaced and the call retried once.
+
+    ``rounds`` sets the PBKDF2 rounds for new hashes (passlib's default when
+    None); ``needs_update`` tells the caller a stored hash was made with a
+    different setting and should be replaced after a successful login.
+    """
+
+    def __init__(self, workers=2, max_pending=16, rounds=None, timeout=30.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self.rejected = 0
+        self._handler = _handler(rounds)
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        # Created on first use, and again in each forked worker: a pool's
+        # processes and threads belong to the process that started it. Spawned
+        # children re-import __main__, so scripts need a __main__ guard.
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard_pool(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        future = None
+        try:
+            for _ in range(2):
+                pool = self._get_pool()
+                try:
+                    future = pool.submit(fn, *args)
+                    return future.result(self.timeout)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed); every later call would fail on this pool
+                    log.warning("Password hashing pool broke; starting a new one")
+                    self._discard_pool(pool)
+                    future = None
+            raise PasswordHasherBusy("Password hashing pool is unavailable")
+        except TimeoutError:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password operation timed out")
+        finally:
+            if future is not None and not future.done():
+                # Hold the slot until the abandoned task finishes so the bound still holds
+                future.add_done_callback(lambda _: self._slots.release())
+            else:
+                self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, hashed):
+        return self._run(_verify, password, hashed)
+
+    def needs_update(self, hashed):
+        """True if ``hashed`` was made with different settings than new hashes use."""
+        return self._handler.needs_update(hashed)
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
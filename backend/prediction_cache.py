@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU cache of predict_proba rows keyed on the input feature vector.
+
+    Keys are the normalized feature tuple; every lookup also carries the
+    version of the model that would score it, and the whole cache is dropped
+    the first time a different version shows up. Entries expire
+    ``ttl_seconds`` after they are stored and the least recently used entry
+    is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=300.0):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(features):
+        return tuple(float(value) for value in features)
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get_many(self, version, rows):
+        """Cached probabilities for each row, or None where it has to be scored."""
+        keys = [self.key(row) for row in rows]
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            self._check_version(version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    results.append(entry[1])
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    results.append(None)
+                    self.misses += 1
+        return results
+
+    def put_many(self, version, rows, probs):
+        """Store freshly scored rows produced by model ``version``."""
+        expires = time.monotonic() + self.ttl
+        items = [(self.key(row), prob) for row, prob in zip(rows, probs)]
+        with self._lock:
+            self._check_version(version)
+            for key, prob in items:
+                self._entries[key] = (expires, prob)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, version, features):
+        return self.get_many(version, [features])[0]
+
+    def put(self, version, features, prob):
+        self.put_many(version, [features], [prob])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'model_version': self._version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,44 @@
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from features import FEATURE_COLUMNS, TARGET_COLUMN  # noqa: F401 (re-exported for train.py)
+
+# Features where 0 values are likely missing data
+ZERO_AS_MISSING_COLUMNS = ['Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI']
+
+
+class ZeroMedianImputer(BaseEstimator, TransformerMixin):
+    """Replace 0 with the column median in the columns where 0 means "not measured".
+
+    Same rule as modelTrain.ipynb: the median is taken over the whole column,
+    zeros included. Lives in its own module so pickled pipelines can import
+    it from app.py and the training CLI alike.
+    """
+
+    def __init__(self, columns=tuple(ZERO_AS_MISSING_COLUMNS), feature_names=tuple(FEATURE_COLUMNS)):
+        self.columns = columns
+        self.feature_names = feature_names
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=np.float64)
+        self.indices_ = np.array([list(self.feature_names).index(column) for column in self.columns], dtype=np.intp)
+        self.medians_ = np.median(X[:, self.indices_], axis=0)
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        block = X[:, self.indices_]
+        X[:, self.indices_] = np.where(block == 0, self.medians_, block)
+        return X
+
+    @classmethod
+    def from_medians(cls, medians, columns=tuple(ZERO_AS_MISSING_COLUMNS), feature_names=tuple(FEATURE_COLUMNS)):
+        """An already-fitted imputer, for medians computed out of core."""
+        imputer = cls(columns=columns, feature_names=feature_names)
+        imputer.indices_ = np.array([list(feature_names).index(column) for column in columns], dtype=np.intp)
+        imputer.medians_ = np.asarray([medians[column] for column in columns], dtype=np.float64)
+        imputer.n_features_in_ = len(feature_names)
+        return imputer
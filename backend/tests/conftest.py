@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+# db reads DATABASE_PATH and app its directories on import, so point them at a
+# scratch directory before any test module imports them
+_scratch = tempfile.mkdtemp(prefix='diabetes-app-tests-')
+os.environ.setdefault('DATABASE_PATH', os.path.join(_scratch, 'users.db'))
+os.environ.setdefault('JOBS_DIR', os.path.join(_scratch, 'jobs'))
+os.environ.setdefault('MODEL_REGISTRY_DIR', os.path.join(_scratch, 'models'))
+os.environ.setdefault('MODEL_PATH', os.path.join(_scratch, 'rmodel.pkl'))
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('JOBS_WORKERS', '1')
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    """One app for the whole session; create_app() sets up process-wide services."""
+    import app as app_module
+
+    return app_module.create_app(preload_model=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
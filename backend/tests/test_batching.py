@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+
+from batching import PredictionBatcher
+
+
+class FixedModel:
+    """Answers every row with the same probabilities, so results show which model scored them."""
+
+    def __init__(self, prob):
+        self.prob = prob
+        self.batches = []
+
+    def predict_proba(self, rows):
+        self.batches.append(len(rows))
+        return np.tile([1 - self.prob, self.prob], (len(rows), 1))
+
+
+def test_rows_are_scored_by_the_model_they_were_queued_with():
+    old, new = FixedModel(0.1), FixedModel(0.9)
+    # A long window so both models' rows land in one batch
+    batcher = PredictionBatcher(lambda model, rows: model.predict_proba(rows), max_wait_ms=200, max_batch=64)
+    results = {}
+
+    def call(i, model):
+        results[i] = (model, batcher.predict_proba([i] * 8, model))
+
+    threads = [threading.Thread(target=call, args=(i, old if i % 2 else new)) for i in range(20)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        batcher.close()
+
+    for model, prob in results.values():
+        assert prob[1] == model.prob
+    assert sum(old.batches) == 10 and sum(new.batches) == 10
+    assert batcher.stats()['rows'] == 20
+
+
+def test_a_failing_model_only_fails_its_own_rows():
+    def predict(model, rows):
+        if model == 'broken':
+            raise ValueError("boom")
+        return np.zeros((len(rows), 2))
+
+    batcher = PredictionBatcher(predict, max_wait_ms=200, max_batch=8)
+    outcomes = {}
+
+    def call(model):
+        try:
+            outcomes[model] = batcher.predict_proba([0] * 8, model).tolist()
+        except ValueError as e:
+            outcomes[model] = str(e)
+
+    threads = [threading.Thread(target=call, args=(model,)) for model in ('broken', 'ok')]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        batcher.close()
+    assert outcomes == {'broken': 'boom', 'ok': [0.0, 0.0]}
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+import db
+
+
+def columns(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    finally:
+        conn.close()
+
+
+def user_version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_init_db_applies_every_migration(tmp_path):
+    path = str(tmp_path / 'fresh.db')
+    db.init_db(path)
+    db.init_db(path)
+    assert user_version(path) == len(db.MIGRATIONS)
+    assert columns(path, 'scoring_jobs').count('pool_failures') == 1
+
+
+def test_workers_migrating_at_once_apply_each_step_once(tmp_path):
+    # A database from before the migrations existed
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT)")
+    conn.execute("CREATE TABLE predictions (id INTEGER PRIMARY KEY, user_id INTEGER, prediction TEXT, "
+                 "glucose REAL, blood_pressure REAL, risk_percentage REAL, diet_suggestion TEXT, sex TEXT, "
+                 "timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.commit()
+    conn.close()
+
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def boot():
+        barrier.wait()
+        try:
+            db.init_db(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=boot) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert user_version(path) == len(db.MIGRATIONS)
+    assert columns(path, 'scoring_jobs').count('pool_failures') == 1
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'broken.db')
+    monkeypatch.setattr(db, 'MIGRATIONS', db.MIGRATIONS[:1] + ("CREATE TABLE broken (",))
+    try:
+        db.init_db(path)
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError("the broken migration should have raised")
+    # Neither the first migration's version bump nor the base tables were committed
+    assert user_version(path) == 0
+    assert columns(path, 'users') == []
+
+
+def test_pool_failures_column_added_once_when_user_version_lags(tmp_path):
+    # The column is there but user_version never recorded its migration
+    path = str(tmp_path / 'lagging.db')
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA user_version = {len(db.MIGRATIONS) - 1}")
+    conn.commit()
+    conn.close()
+
+    db.init_db(path)
+    assert user_version(path) == len(db.MIGRATIONS)
+    assert columns(path, 'scoring_jobs').count('pool_failures') == 1
@@ -0,0 +1,108 @@
+"""CompiledForest must score exactly like the sklearn forest it was built from."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from forest_engine import CompiledForest, CompiledPipeline
+from preprocessing import FEATURE_COLUMNS, TARGET_COLUMN, ZeroMedianImputer
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def with_missing(X, rate, rng):
+    """Copy of ``X`` with about ``rate`` of its cells set to NaN, plus one all-NaN row."""
+    X = X.copy()
+    X[rng.random(X.shape) < rate] = np.nan
+    X[0] = np.nan
+    return X
+
+
+@pytest.fixture(scope='module')
+def data():
+    frame = pd.read_csv(os.path.join(BACKEND_DIR, 'diabetes.csv'))
+    return frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64), frame[TARGET_COLUMN].to_numpy()
+
+
+@pytest.fixture(scope='module')
+def samples(data):
+    X, _ = data
+    rng = np.random.default_rng(42)
+    X_random = rng.uniform(X.min(axis=0), X.max(axis=0), size=(2000, X.shape[1]))
+    return {
+        'diabetes.csv': X,
+        'random': X_random,
+        'diabetes.csv with NaN': with_missing(X, 0.15, rng),
+        'random with NaN': with_missing(X_random, 0.3, rng),
+    }
+
+
+@pytest.fixture(scope='module', params=['fitted without NaN', 'fitted with NaN'])
+def forest(request, data):
+    X, y = data
+    if request.param == 'fitted with NaN':
+        # Every split learns its own missing-value direction
+        X = with_missing(X, 0.1, np.random.default_rng(0))
+    return RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+
+
+def engines(forest, tmp_path):
+    path = str(tmp_path / 'compiled.joblib')
+    CompiledForest.from_sklearn(forest).save(path)
+    return {
+        'array traversal': CompiledForest.from_sklearn(forest, native_batch_rows=None),
+        # Batches above 100 rows go to sklearn's own traversal
+        'native fallback': CompiledForest.from_sklearn(forest, native_batch_rows=100),
+        'loaded from disk': CompiledForest.load(path, forest=forest, native_batch_rows=None),
+    }
+
+
+def assert_equivalent(engine, reference, X):
+    for rows in (1, 100, len(X)):
+        sample = X[:rows]
+        np.testing.assert_allclose(engine.predict_proba(sample), reference.predict_proba(sample), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(engine.predict(sample), reference.predict(sample))
+
+
+@pytest.mark.parametrize('engine_name', ['array traversal', 'native fallback', 'loaded from disk'])
+@pytest.mark.parametrize('sample_name', ['diabetes.csv', 'random', 'diabetes.csv with NaN', 'random with NaN'])
+def test_matches_sklearn(forest, samples, tmp_path, engine_name, sample_name):
+    assert_equivalent(engines(forest, tmp_path)[engine_name], forest, samples[sample_name])
+
+
+@pytest.mark.parametrize('engine_name', ['array traversal', 'native fallback'])
+def test_rejects_infinity(forest, tmp_path, engine_name):
+    engine = engines(forest, tmp_path)[engine_name]
+    X = np.array([[2, np.inf, 70, 20, 85, 32.5, 0.5, 25]] * 200)
+    for rows in (1, 200):
+        with pytest.raises(ValueError):
+            engine.predict_proba(X[:rows])
+
+
+@pytest.mark.parametrize('sample_name', ['diabetes.csv', 'random with NaN'])
+def test_pipeline_matches_sklearn(data, samples, sample_name):
+    X, y = data
+    pipeline = Pipeline([
+        ('impute', ZeroMedianImputer().fit(X)),
+        ('scale', MinMaxScaler().fit(X)),
+        ('model', RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)),
+    ])
+    compiled = CompiledPipeline([step for _, step in pipeline.steps[:-1]],
+                                CompiledForest.from_sklearn(pipeline.steps[-1][1], native_batch_rows=None))
+    assert_equivalent(compiled, pipeline, samples[sample_name])
+
+
+def test_outdated_cache_raises_key_error(forest, tmp_path):
+    import joblib
+
+    path = str(tmp_path / 'compiled.joblib')
+    CompiledForest.from_sklearn(forest).save(path)
+    state = joblib.load(path)
+    del state['missing_go_to_left']
+    joblib.dump(state, path)
+    with pytest.raises(KeyError):
+        CompiledForest.load(path, forest=forest)
@@ -0,0 +1,74 @@
+import uuid
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import db
+
+
+@pytest.fixture
+def user(app):
+    """A fresh user with 25 predictions; several share a timestamp, so pages must break ties by id."""
+    with db.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, password) VALUES (?, 'x')",
+                               (f"history-{uuid.uuid4().hex}",)).lastrowid
+        timestamps = [f"2026-01-01 00:00:{second:02d}" for second in range(10) for _ in range(2)]
+        timestamps += ["2026-01-02 00:00:00"] * 5
+        conn.executemany(
+            "INSERT INTO predictions (user_id, prediction, glucose, blood_pressure, risk_percentage, "
+            "diet_suggestion, sex, timestamp) VALUES (?, 'Not Diabetic', ?, 70, 10, 'd', 'female', ?)",
+            [(user_id, float(i), timestamp) for i, timestamp in enumerate(timestamps)]
+        )
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    return {'Authorization': f"Bearer {token}"}
+
+
+def full_history(client, headers):
+    response = client.get('/history', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['next_cursor'] is None
+    return response.get_json()['history']
+
+
+def test_full_history_is_newest_first(client, user):
+    history = full_history(client, user)
+    assert len(history) == 25
+    assert [entry['timestamp'] for entry in history] == sorted((entry['timestamp'] for entry in history), reverse=True)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 25, 1000])
+def test_pages_cover_the_history_exactly_once(client, user, limit):
+    pages, cursor = [], None
+    while True:
+        url = f"/history?limit={limit}" + (f"&before={cursor}" if cursor else '')
+        body = client.get(url, headers=user).get_json()
+        assert len(body['history']) <= limit
+        pages.extend(body['history'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert pages == full_history(client, user)
+
+
+def test_last_page_has_no_cursor(client, user):
+    body = client.get('/history?limit=25', headers=user).get_json()
+    assert len(body['history']) == 25 and body['next_cursor'] is None
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1001', 'limit=abc', 'limit=5&before=not-a-cursor'])
+def test_invalid_pagination_is_rejected(client, user, query):
+    assert client.get(f"/history?{query}", headers=user).status_code == 400
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'json'])
+def test_stream_export_matches_full_history(client, user, fmt):
+    import json
+
+    body = client.get(f"/history?stream={fmt}", headers=user).get_data(as_text=True)
+    rows = [json.loads(line) for line in body.splitlines()] if fmt == 'ndjson' else json.loads(body)['history']
+    assert rows == full_history(client, user)
+
+
+def test_history_requires_a_token(client):
+    assert client.get('/history').status_code == 401
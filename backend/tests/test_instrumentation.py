@@ -0,0 +1,23 @@
+from instrumentation import MetricsRegistry
+
+
+def test_render_names_counter_families_after_their_total_sample():
+    registry = MetricsRegistry()
+    registry.counter('jobs', 'Jobs run.', ('outcome',)).inc(outcome='ok')
+    registry.histogram('latency_seconds', 'Latency.', buckets=(1.0,)).observe(0.5)
+    registry.add_collector(lambda: [('cache_hits', 'counter', 'Cache hits.', [('cache_hits_total', (), 3)])])
+
+    assert registry.render().splitlines() == [
+        '# HELP jobs_total Jobs run.',
+        '# TYPE jobs_total counter',
+        'jobs_total{outcome="ok"} 1',
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="1.0"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        'latency_seconds_sum 0.5',
+        'latency_seconds_count 1',
+        '# HELP cache_hits_total Cache hits.',
+        '# TYPE cache_hits_total counter',
+        'cache_hits_total 3',
+    ]
@@ -0,0 +1,61 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_engine import CompiledForest
+from model_registry import ModelRegistry
+from preprocessing import FEATURE_COLUMNS, TARGET_COLUMN
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope='module')
+def forest():
+    data = pd.read_csv(os.path.join(BACKEND_DIR, 'diabetes.csv'))
+    return RandomForestClassifier(n_estimators=10, random_state=0).fit(
+        data[FEATURE_COLUMNS].to_numpy(dtype=np.float64), data[TARGET_COLUMN])
+
+
+@pytest.fixture
+def legacy(tmp_path, forest):
+    path = str(tmp_path / 'rmodel.pkl')
+    joblib.dump(forest, path)
+    return path
+
+
+def test_legacy_model_compiled_arrays_are_cached_and_mapped(tmp_path, legacy):
+    root = str(tmp_path / 'models')
+    first = ModelRegistry(root, legacy).load_active()
+    cached = os.path.join(root, f".legacy-{first.version}.joblib")
+    assert os.path.exists(cached)
+    assert isinstance(first.predictor.value, np.memmap)
+
+    second = ModelRegistry(root, legacy).load_active()
+    assert second.version == first.version
+    assert isinstance(second.predictor.value, np.memmap)
+    # The cache is not a registered version
+    assert ModelRegistry(root, legacy).versions() == []
+
+
+def test_unwritable_cache_falls_back_to_memory(tmp_path, legacy, monkeypatch):
+    def read_only(self, path):
+        raise PermissionError(13, 'Permission denied', path)
+
+    monkeypatch.setattr(CompiledForest, 'save', read_only)
+    active = ModelRegistry(str(tmp_path / 'models'), legacy).load_active()
+    assert not isinstance(active.predictor.value, np.memmap)
+    assert active.predictor.predict_proba(np.zeros((1, 8))).shape == (1, 2)
+
+
+def test_registered_version_is_served_only_once_activated(tmp_path, legacy, forest):
+    root = str(tmp_path / 'models')
+    registry = ModelRegistry(root, legacy)
+    legacy_version = registry.load_active().version
+    registry.register('candidate', forest)
+    assert ModelRegistry(root, legacy).load_active().version == legacy_version
+    registry.activate('candidate')
+    assert ModelRegistry(root, legacy).load_active().version == 'candidate'
@@ -0,0 +1,77 @@
+import random
+
+import pandas as pd
+import pytest
+
+from nutrition_recommendation import DiabetesNutritionAdvisor
+
+FIELDS = ('Age', 'Height', 'Weight', 'Sex', 'ActivityLevel', 'Goal', 'Diabetic')
+
+
+def make_cohort(n_rows, seed):
+    """Random /recommend records in mixed case and types, including invalid activity levels."""
+    rng = random.Random(seed)
+    records = {field: [] for field in FIELDS}
+    for _ in range(n_rows):
+        records['Age'].append(rng.choice([rng.randint(18, 90), round(rng.uniform(18, 90), 1), str(rng.randint(18, 90))]))
+        records['Height'].append(round(rng.uniform(1.4, 2.1), rng.choice([2, 3])))
+        records['Weight'].append(round(rng.uniform(40, 150), rng.choice([0, 1, 2])))
+        records['Sex'].append(rng.choice(['male', 'Female', 'MALE', 'female']))
+        records['ActivityLevel'].append(rng.choice(['low', 'Moderate', 'medium', 'High', 'unknown']))
+        records['Goal'].append(rng.choice(['cutting', 'Bulking', 'standard']))
+        records['Diabetic'].append(rng.choice(['true', 'False', True, False]))
+    return records
+
+
+def scalar(advisor, records):
+    results = []
+    for i in range(len(records['Age'])):
+        diabetic = records['Diabetic'][i]
+        if not isinstance(diabetic, bool):
+            diabetic = diabetic.lower() == 'true'
+        try:
+            results.append(advisor.get_nutrition_recommendations(
+                float(records['Age'][i]), records['Height'][i], records['Weight'][i], records['Sex'][i],
+                records['ActivityLevel'][i], records['Goal'][i], diabetic
+            ))
+        except ValueError as e:
+            results.append({'error': str(e)})
+    return results
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_batch_matches_scalar_exactly(seed):
+    advisor = DiabetesNutritionAdvisor()
+    records = make_cohort(2000, seed)
+    assert advisor.get_nutrition_recommendations_batch(records) == scalar(advisor, records)
+
+
+def test_dataframe_input_matches_dict_input():
+    advisor = DiabetesNutritionAdvisor()
+    records = make_cohort(500, 3)
+    assert (advisor.get_nutrition_recommendations_batch(pd.DataFrame(records))
+            == advisor.get_nutrition_recommendations_batch(records))
+
+
+def test_invalid_rows_only_fail_themselves():
+    advisor = DiabetesNutritionAdvisor()
+    records = {
+        'Age': [45, 'abc', 45, 45],
+        'Height': [1.7, 1.7, 0, 1.7],
+        'Weight': [80, 80, 80, 80],
+        'Sex': ['female', 'female', 'female', 'female'],
+        'ActivityLevel': ['moderate', 'moderate', 'moderate', 'sedentary'],
+        'Goal': ['standard', 'standard', 'standard', 'standard'],
+    }
+    results = advisor.get_nutrition_recommendations_batch(records)
+    assert results[0] == advisor.get_nutrition_recommendations(45, 1.7, 80, 'female', 'moderate', 'standard')
+    assert results[1] == {'error': 'Invalid numeric value for Age'}
+    assert results[2] == {'error': 'float division by zero'}
+    assert results[3]['error'].startswith('Invalid activity level: sedentary')
+
+
+def test_missing_diabetic_column_means_not_diabetic():
+    advisor = DiabetesNutritionAdvisor()
+    records = {field: values for field, values in make_cohort(50, 4).items() if field != 'Diabetic'}
+    expected = scalar(advisor, {**records, 'Diabetic': [False] * 50})
+    assert advisor.get_nutrition_recommendations_batch(records) == expected
@@ -0,0 +1,66 @@
+import pytest
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_hit_after_put_with_normalized_key():
+    cache = PredictionCache(max_entries=10)
+    cache.put('v1', [2, 120, 70], [0.8, 0.2])
+    assert cache.get('v1', [2.0, '120', 70.0]) == [0.8, 0.2]
+    assert cache.stats()['hits'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('v1', [1], 'a')
+    cache.put('v1', [2], 'b')
+    assert cache.get('v1', [1]) == 'a'  # [2] is now the least recently used
+    cache.put('v1', [3], 'c')
+    assert cache.get('v1', [2]) is None
+    assert cache.get('v1', [1]) == 'a'
+    assert cache.get('v1', [3]) == 'c'
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['entries'] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = PredictionCache(max_entries=10, ttl_seconds=5)
+    cache.put('v1', [1], 'a')
+    clock[0] += 4.9
+    assert cache.get('v1', [1]) == 'a'
+    clock[0] += 0.2
+    assert cache.get('v1', [1]) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_new_model_version_invalidates_everything():
+    cache = PredictionCache(max_entries=10)
+    cache.put_many('v1', [[1], [2]], ['a', 'b'])
+    assert cache.get('v2', [1]) is None
+    stats = cache.stats()
+    assert stats['invalidations'] == 1
+    assert stats['entries'] == 0
+    assert stats['model_version'] == 'v2'
+    # Entries stored for v2 are not served to a request still on v1
+    cache.put('v2', [1], 'new')
+    assert cache.get('v1', [1]) is None
+
+
+def test_get_many_reports_each_row():
+    cache = PredictionCache(max_entries=10)
+    cache.put_many('v1', [[1], [3]], ['a', 'c'])
+    assert cache.get_many('v1', [[1], [2], [3]]) == ['a', None, 'c']
+    assert cache.stats()['misses'] == 1
+
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError):
+        PredictionCache(max_entries=0)
@@ -0,0 +1,99 @@
+import queue
+import time
+
+import pytest
+
+import db
+
+
+def row(user_id=1):
+    return (user_id, 'Not Diabetic', 120.0, 70.0, 12.5, 'Eat well', 'female')
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    db.init_db(path)
+    return path
+
+
+def count(path):
+    conn = db.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_flush_waits_for_submitted_rows(path):
+    writer = db.PredictionWriter(path, flush_interval=1.0)
+    try:
+        for _ in range(300):
+            writer.submit(row())
+        assert writer.flush(timeout=5)
+        assert count(path) == 300
+        assert writer.written == 300
+    finally:
+        writer.close()
+
+
+def test_close_writes_remaining_rows(path):
+    writer = db.PredictionWriter(path, flush_interval=10.0)
+    writer.submit(row())
+    writer.close()
+    assert count(path) == 1
+
+
+def test_flush_returns_at_once_when_not_running(path):
+    writer = db.PredictionWriter(path)
+    writer.close()
+    started = time.monotonic()
+    assert writer.flush(timeout=5) is False
+    assert time.monotonic() - started < 1
+    with pytest.raises(RuntimeError):
+        writer.submit(row())
+
+
+def test_writer_that_cannot_connect_stops(tmp_path):
+    writer = db.PredictionWriter(str(tmp_path / 'missing' / 'dir' / 'x.db'))
+    writer._thread.join(5)
+    assert not writer.alive
+    assert writer.flush(timeout=5) is False
+
+
+def test_submit_beyond_max_pending_raises(path):
+    # Hold the write lock so the writer thread stalls on its first row
+    blocker = db.connect(path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    writer = db.PredictionWriter(path, batch_size=1, max_pending=2)
+    try:
+        writer.submit(row())
+        deadline = time.monotonic() + 5
+        while not writer._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.submit(row())
+        writer.submit(row())
+        with pytest.raises(queue.Full):
+            writer.submit(row())
+    finally:
+        blocker.rollback()
+        blocker.close()
+        writer.close()
+    assert count(path) == 3
+
+
+def test_get_prediction_writer_replaces_a_dead_writer(monkeypatch, path):
+    monkeypatch.setattr(db, 'DATABASE_PATH', path)
+    dead = db.PredictionWriter(path)
+    dead.close()
+    dead._queue.put_nowait(row(7))
+    monkeypatch.setattr(db, '_writer', dead)
+    writer = db.get_prediction_writer()
+    try:
+        assert writer is not dead and writer.alive
+        assert writer.flush(timeout=5)
+        conn = db.connect(path)
+        assert conn.execute("SELECT user_id FROM predictions").fetchall() == [(7,)]
+        conn.close()
+    finally:
+        writer.close()
@@ -0,0 +1,70 @@
+"""What a ``gunicorn --preload`` master leaves running for the workers it forks."""
+import os
+import threading
+
+import pytest
+
+import app as app_module
+from bulk_scoring import ScoringJobs
+
+
+def scoring_threads():
+    return [t for t in threading.enumerate() if t.name == 'scoring-jobs']
+
+
+def test_scoring_jobs_runner_starts_lazily(tmp_path):
+    jobs = ScoringJobs(str(tmp_path / 'jobs'), registry=None)
+    try:
+        assert jobs._thread is None
+        jobs.start()
+        thread = jobs._thread
+        assert thread.is_alive()
+        jobs.start()
+        assert jobs._thread is thread
+    finally:
+        jobs.close()
+    assert not thread.is_alive()
+
+
+def test_close_without_start(tmp_path):
+    ScoringJobs(str(tmp_path / 'jobs'), registry=None).close()
+
+
+def run_in_child(fn):
+    """Fork, run ``fn`` in the child and return the line it reports."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = str(fn())
+        except BaseException as e:
+            result = f"error: {e!r}"
+        os.write(write_fd, result.encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+    return result
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_worker_without_model_starts_its_own_loader(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(app_module, 'start_model_loader', lambda: started.append(os.getpid()))
+    assert app_module.model_registry.active is None
+
+    # The hook runs in the child before fn, so fn only reports what it saw
+    assert run_in_child(lambda: started == [os.getpid()]) == 'True'
+    assert started == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_worker_starts_scoring_runner_on_first_request(client):
+    def first_request():
+        before = len(scoring_threads())
+        client.get('/ready')
+        return (before, len(scoring_threads()))
+
+    assert run_in_child(first_request) == '(0, 1)'
@@ -0,0 +1,244 @@
+"""Train the diabetes model and register it as a new model version.
+
+Reproduces modelTrain.ipynb as a script: zeros in Glucose, BloodPressure,
+SkinThickness, Insulin and BMI are replaced by column medians, IQR outliers
+in those columns are dropped, features are MinMax-scaled and a
+RandomForestClassifier is tuned with GridSearchCV over all cores. The
+imputer, scaler and forest are saved together as one sklearn Pipeline, with
+its metrics, in the model registry that app.py serves from.
+
+Usage: python train.py [--data diabetes.csv] [--activate] [--n-jobs N] [--max-rows N]
+
+The CSV is read in chunks, so preprocessing never holds more than one chunk
+of raw rows; only the cleaned feature matrix is kept for fitting. Prepared
+data is cached with joblib.Memory (``--cache-dir``) and reused while the CSV
+is unchanged, so trying other search settings skips the preprocessing.
+"""
+import argparse
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Memory
+
+from model_registry import ModelRegistry
+from preprocessing import FEATURE_COLUMNS, TARGET_COLUMN, ZERO_AS_MISSING_COLUMNS, ZeroMedianImputer
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Grid from the notebook's hyperparameter tuning step
+PARAM_GRID = {
+    'n_estimators': [50, 100, 150],
+    'max_depth': [None, 5, 10, 15],
+    'min_samples_split': [2, 5, 10],
+}
+RANDOM_STATE = 42
+
+
+def read_chunks(path, chunk_size):
+    columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        missing = [column for column in columns if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        yield chunk[columns]
+
+
+def quantile_from_counts(counts, q):
+    """pandas' default (linear) quantile of the values described by a value_counts Series."""
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=np.float64)
+    cumulative = counts.to_numpy().cumsum()
+    position = q * (cumulative[-1] - 1)
+    low = values[np.searchsorted(cumulative, math.floor(position), side='right')]
+    high = values[np.searchsorted(cumulative, math.ceil(position), side='right')]
+    return low + (high - low) * (position - math.floor(position))
+
+
+def prepare_training_data(path, signature, chunk_size=100000, max_rows=None, random_state=RANDOM_STATE):
+    """Impute, drop outliers and (optionally) subsample the CSV in two chunked passes.
+
+    ``signature`` identifies the file contents (path, size, mtime) so the
+    joblib.Memory cache is invalidated when the CSV changes. Returns a dict
+    with the imputed feature matrix, the labels and the fitted statistics.
+    """
+    # Pass 1: value counts give exact medians and quartiles without holding the data
+    counts = {column: pd.Series(dtype=np.float64) for column in ZERO_AS_MISSING_COLUMNS}
+    rows_read = 0
+    for chunk in read_chunks(path, chunk_size):
+        rows_read += len(chunk)
+        for column in ZERO_AS_MISSING_COLUMNS:
+            counts[column] = counts[column].add(chunk[column].value_counts(), fill_value=0)
+    if not rows_read:
+        raise ValueError("No rows to train on")
+
+    medians, lower, upper = {}, {}, {}
+    for column in ZERO_AS_MISSING_COLUMNS:
+        medians[column] = quantile_from_counts(counts[column], 0.5)
+        # After imputation every zero counts as the median
+        imputed = counts[column].copy()
+        zeros = imputed.pop(0.0) if 0.0 in imputed.index else 0
+        imputed = imputed.add(pd.Series({medians[column]: zeros}), fill_value=0)
+        q1, q3 = quantile_from_counts(imputed, 0.25), quantile_from_counts(imputed, 0.75)
+        lower[column], upper[column] = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    imputer = ZeroMedianImputer.from_medians(medians)
+
+    # Pass 2: keep the in-range rows, sampling uniformly when max_rows caps the total
+    rng = np.random.default_rng(random_state)
+    rate = min(1.0, max_rows / rows_read) if max_rows else 1.0
+    low_bounds = np.array([lower[column] for column in ZERO_AS_MISSING_COLUMNS])
+    high_bounds = np.array([upper[column] for column in ZERO_AS_MISSING_COLUMNS])
+    features, labels = [], []
+    rows_outliers = rows_incomplete = 0
+    for chunk in read_chunks(path, chunk_size):
+        X = imputer.transform(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+        y = chunk[TARGET_COLUMN].to_numpy(dtype=np.float64)
+        complete = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        block = X[:, imputer.indices_]
+        in_range = ((block >= low_bounds) & (block <= high_bounds)).all(axis=1)
+        rows_incomplete += int((~complete).sum())
+        rows_outliers += int((complete & ~in_range).sum())
+        keep = complete & in_range
+        if rate < 1.0:
+            keep &= rng.random(len(chunk)) < rate
+        features.append(X[keep])
+        labels.append(y[keep].astype(np.int64))
+
+    return {
+        'X': np.concatenate(features),
+        'y': np.concatenate(labels),
+        'medians': medians,
+        'iqr_bounds': {column: [lower[column], upper[column]] for column in ZERO_AS_MISSING_COLUMNS},
+        'rows_read': rows_read,
+        'rows_outliers': rows_outliers,
+        'rows_incomplete': rows_incomplete,
+    }
+
+
+def split_data(X, y, random_state=RANDOM_STATE):
+    """80/10/10 stratified train/validation/test split, as in the notebook."""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_temp, y_train, y_temp = train_test_split(
+        X, y, test_size=0.2, random_state=random_state, stratify=y
+    )
+    # Skip stratify on the val/test split when a class is too rare for it
+    stratify_temp = None if np.bincount(y_temp).min() < 2 else y_temp
+    X_val, X_test, y_val, y_test = train_test_split(
+        X_temp, y_temp, test_size=0.5, random_state=random_state, stratify=stratify_temp
+    )
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+def train(data_path, n_jobs=-1, cv=5, search=True, chunk_size=100000, max_rows=None, cache_dir=None,
+          random_state=RANDOM_STATE):
+    """Fit the preprocessing + forest Pipeline; returns (pipeline, metrics)."""
+    import sklearn
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import MinMaxScaler
+
+    started = time.time()
+    data_path = os.path.abspath(data_path)
+    stat = os.stat(data_path)
+    prepare = Memory(cache_dir, verbose=0).cache(prepare_training_data) if cache_dir else prepare_training_data
+    data = prepare(data_path, (data_path, stat.st_size, stat.st_mtime_ns), chunk_size, max_rows, random_state)
+    X, y = data['X'], data['y']
+    prepared = time.time()
+
+    imputer = ZeroMedianImputer.from_medians(data['medians'])
+    # Fitted on all kept rows before splitting, as in the notebook
+    scaler = MinMaxScaler().fit(X)
+    X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y, random_state)
+
+    if search:
+        grid_search = GridSearchCV(
+            RandomForestClassifier(random_state=random_state),
+            PARAM_GRID, cv=cv, scoring='accuracy', n_jobs=n_jobs,
+        )
+        grid_search.fit(scaler.transform(X_train), y_train)
+        forest, cv_accuracy = grid_search.best_estimator_, float(grid_search.best_score_)
+    else:
+        forest = RandomForestClassifier(n_estimators=100, random_state=random_state, n_jobs=n_jobs)
+        forest.fit(scaler.transform(X_train), y_train)
+        cv_accuracy = None
+    # Serving scores one row at a time; a thread pool per call would only add overhead
+    forest.set_params(n_jobs=None)
+
+    pipeline = Pipeline([('impute', imputer), ('scale', scaler), ('model', forest)])
+
+    def evaluate(X_eval, y_eval):
+        pred = pipeline.predict(X_eval)
+        return {
+            'accuracy': float(accuracy_score(y_eval, pred)),
+            'f1': float(f1_score(y_eval, pred)),
+            'roc_auc': float(roc_auc_score(y_eval, pipeline.predict_proba(X_eval)[:, 1])),
+        }
+
+    test = evaluate(X_test, y_test)
+    metrics = {
+        # /model_accuracy reports this one
+        'accuracy': test['accuracy'],
+        'test': test,
+        'validation': evaluate(X_val, y_val),
+        'cv_accuracy': cv_accuracy,
+        'params': {key: forest.get_params()[key] for key in PARAM_GRID},
+        'grid_search': search,
+        'rows': {
+            'read': data['rows_read'],
+            'outliers_dropped': data['rows_outliers'],
+            'incomplete_dropped': data['rows_incomplete'],
+            'used': int(len(y)),
+            'train': int(len(y_train)),
+            'validation': int(len(y_val)),
+            'test': int(len(y_test)),
+        },
+        'medians': data['medians'],
+        'iqr_bounds': data['iqr_bounds'],
+        'data': {'path': data_path, 'size': stat.st_size, 'modified': stat.st_mtime},
+        'random_state': random_state,
+        'sklearn_version': sklearn.__version__,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'prepare_seconds': round(prepared - started, 3),
+        'train_seconds': round(time.time() - prepared, 3),
+    }
+    return pipeline, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=os.path.join(BASE_DIR, 'diabetes.csv'), help='training CSV')
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'models')))
+    parser.add_argument('--version', default=time.strftime('%Y%m%d-%H%M%S'))
+    parser.add_argument('--activate', action='store_true', help='serve the new version right away')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='parallel fits (-1 uses every core)')
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--no-search', action='store_true',
+                        help='fit one forest with 100 trees instead of the grid search')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='CSV rows read at a time')
+    parser.add_argument('--max-rows', type=int, help='train on a uniform sample of about this many rows')
+    parser.add_argument('--cache-dir', default=os.path.join(BASE_DIR, '.train_cache'),
+                        help="joblib.Memory directory for prepared data ('' disables it)")
+    args = parser.parse_args()
+
+    pipeline, metrics = train(
+        args.data, n_jobs=args.n_jobs, cv=args.cv, search=not args.no_search, chunk_size=args.chunk_size,
+        max_rows=args.max_rows, cache_dir=args.cache_dir or None,
+    )
+    print(f"Rows used: {metrics['rows']['used']} of {metrics['rows']['read']} "
+          f"({metrics['rows']['outliers_dropped']} outliers dropped)")
+    print(f"Parameters: {metrics['params']}")
+    print(f"Validation accuracy: {metrics['validation']['accuracy']:.4f}")
+    print(f"Test accuracy: {metrics['test']['accuracy']:.4f}  F1: {metrics['test']['f1']:.4f}  "
+          f"AUC: {metrics['test']['roc_auc']:.4f}")
+
+    path = ModelRegistry(args.registry).register(args.version, pipeline, metrics, activate=args.activate)
+    print(f"Model version {args.version} saved to {path}" + (" and activated" if args.activate else ""))
+
+
+if __name__ == '__main__':
+    main()